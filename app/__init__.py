@@ -2,7 +2,12 @@ from flask import Flask
 import config
 from .home import home_bp #TODO import inside app_context?
 from .quiz import quiz_bp
-from app.extensions import db, sess
+from .search import search_bp
+from .bundles import bundles_bp
+from .warmup import warmup_bp, start_warmup
+from .profiling import init_profiler
+from app.extensions import db, sess, search_index, cache, exam_sweeper
+from app.tenants import resolve_tenant
 
 def create_app(config_type = None):
     '''Application factory can take several possible configuration
@@ -17,8 +22,19 @@ def create_app(config_type = None):
 
     db.init_app(app)
     sess.init_app(app)
+    search_index.init_app(app)
+    cache.init_app(app)
+    exam_sweeper.init_app(app)
+
+    app.before_request(resolve_tenant)
 
     app.register_blueprint(home.home_bp)
     app.register_blueprint(quiz_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(bundles_bp)
+    app.register_blueprint(warmup_bp)
+
+    init_profiler(app)
+    start_warmup(app)
 
     return app
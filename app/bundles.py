@@ -0,0 +1,210 @@
+from flask import Blueprint, current_app, abort, request, send_file, jsonify
+from app.home import generate_id_list
+from app.models import DEFAULT_TENANT
+from app.qtypes import public_key
+from app.quiz import load_round, extract_answers, score_input
+from app.shuffle import new_seed
+from app.tenants import current_tenant, TENANT_RGX
+import click
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+bundles_bp = Blueprint('bundles', __name__)
+
+DIGEST_RGX = re.compile(r"^[0-9a-f]{64}$")
+
+#bundles are content addressed so a given url can never change
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MANIFEST_MAX_AGE = 5 * 60
+
+def _dumps(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))\
+                .encode('utf-8')
+
+def _write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def write_bundle(answer_key, seed, bundle_dir, key_dir):
+    '''Writes one round as a public, compressed bundle named by the sha256 of
+    its uncompressed json, with the full answer key stored separately under
+    the same digest. Returns the digest.
+    '''
+
+    payload = _dumps({'questions' : [public_key(k) for k in answer_key]})
+    digest = hashlib.sha256(payload).hexdigest()
+
+    #mtime=0 keeps the gzip output byte-identical across rebuilds
+    _write_atomic(os.path.join(bundle_dir, digest + '.json.gz'),
+                    gzip.compress(payload, compresslevel=9, mtime=0))
+
+    if brotli is not None:
+        _write_atomic(os.path.join(bundle_dir, digest + '.json.br'),
+                        brotli.compress(payload))
+
+    _write_atomic(os.path.join(key_dir, digest + '.json'),
+                    _dumps({'seed' : seed, 'answer_key' : answer_key}))
+
+    return digest
+
+def tenant_dirs(tenant):
+    '''(bundle dir, key dir) for a tenant; each tenant's bundles, keys and
+    manifest live apart so one customer's rounds can't be fetched or scored
+    through another's.
+    '''
+
+    config = current_app.config
+    return (os.path.join(config['BUNDLE_DIR'], tenant),
+            os.path.join(config['BUNDLE_KEY_DIR'], tenant))
+
+def load_manifest(bundle_dir):
+    try:
+        with open(os.path.join(bundle_dir, 'manifest.json'), 'rb') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def build_bundles(topics, n_rounds, block_size, tenant):
+    '''Pre-generates n_rounds rounds drawn from the tenant's questions
+    matching topics, using the same id selection and prep as a live quiz,
+    and records them in the tenant's bundle manifest under the sorted,
+    comma-joined topic names.
+    '''
+
+    bundle_dir, key_dir = tenant_dirs(tenant)
+    os.makedirs(bundle_dir, exist_ok=True)
+    os.makedirs(key_dir, exist_ok=True)
+
+    ids = generate_id_list(topics, tenant=tenant)
+    if not ids:
+        return []
+
+    digests = []
+    for _ in range(n_rounds):
+        seed = new_seed()
+        q_ids = random.Random(seed).sample(ids, min(block_size, len(ids)))
+        answer_key = load_round(q_ids, seed, tenant)
+        digests.append(write_bundle(answer_key, seed, bundle_dir, key_dir))
+
+    manifest = load_manifest(bundle_dir)
+    label = ','.join(sorted(topics))
+    manifest[label] = sorted(set(manifest.get(label, [])) | set(digests))
+    _write_atomic(os.path.join(bundle_dir, 'manifest.json'), _dumps(manifest))
+
+    return digests
+
+@bundles_bp.cli.command('build')
+@click.option('--topics', '-t', 'topic_sets', multiple=True, required=True,
+                help='Comma-separated topic names; may be repeated.')
+@click.option('--rounds', '-n', default=50, show_default=True,
+                help='Rounds to generate per topic set.')
+@click.option('--size', '-s', default=20, show_default=True,
+                help='Questions per round.')
+@click.option('--tenant', default=None,
+                help='Tenant whose bank to use; defaults to DEFAULT_TENANT.')
+def build_command(topic_sets, rounds, size, tenant):
+    '''Pre-generate offline quiz round bundles.'''
+
+    tenant = tenant or DEFAULT_TENANT
+    if not TENANT_RGX.match(tenant):
+        raise click.BadParameter('invalid tenant name', param_hint='--tenant')
+
+    for topic_set in topic_sets:
+        topics = [t.strip() for t in topic_set.split(',') if t.strip()]
+        digests = build_bundles(topics, rounds, size, tenant)
+        click.echo('{}: {} bundles'.format(','.join(sorted(topics)),
+                                            len(digests)))
+
+def _accepts(encoding):
+    return encoding in request.accept_encodings
+
+def _vary_tenant(response):
+    '''Same url serves each tenant its own files; shared caches must know.'''
+
+    header = current_app.config.get('TENANT_HEADER')
+    if header:
+        response.vary.add(header)
+
+@bundles_bp.route('/bundles/manifest.json', methods=['GET'])
+def bundle_manifest():
+    bundle_dir, _ = tenant_dirs(current_tenant())
+    response = jsonify(load_manifest(bundle_dir))
+    response.cache_control.public = True
+    response.cache_control.max_age = MANIFEST_MAX_AGE
+    _vary_tenant(response)
+
+    return response
+
+@bundles_bp.route('/bundles/<digest>.json', methods=['GET'])
+def get_bundle(digest):
+    '''Serves a prebuilt round straight from disk in its stored encoding;
+    send_file hands the open file to the server's wsgi.file_wrapper so it can
+    use sendfile() rather than copying through python.
+    '''
+
+    if not DIGEST_RGX.match(digest):
+        abort(404)
+
+    bundle_dir, _ = tenant_dirs(current_tenant())
+
+    for encoding, ext in (('br', '.json.br'), ('gzip', '.json.gz')):
+        path = os.path.join(bundle_dir, digest + ext)
+        if _accepts(encoding) and os.path.exists(path):
+            response = send_file(path, mimetype='application/json',
+                                    etag=digest, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        #rare client that can't take compressed responses
+        path = os.path.join(bundle_dir, digest + '.json.gz')
+        if not os.path.exists(path):
+            abort(404)
+
+        with gzip.open(path, 'rb') as f:
+            response = current_app.response_class(f.read(),
+                                                mimetype='application/json')
+        response.set_etag(digest)
+
+    response.vary.add('Accept-Encoding')
+    _vary_tenant(response)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+
+    return response
+
+@bundles_bp.route('/bundles/<digest>/submit', methods=['POST'])
+def submit_bundle(digest):
+    '''Scores answers to an offline round against its server-side key.'''
+
+    if not DIGEST_RGX.match(digest):
+        abort(404)
+
+    _, key_dir = tenant_dirs(current_tenant())
+    path = os.path.join(key_dir, digest + '.json')
+    try:
+        with open(path, 'rb') as f:
+            answer_key = json.load(f)['answer_key']
+    except FileNotFoundError:
+        abort(404)
+
+    user_answers = extract_answers(request.form)
+
+    #question indices outside the round are user tampering; ignore them
+    user_answers = {k : v for k, v in user_answers.items()
+                        if k < len(answer_key)}
+
+    results = score_input(user_answers, answer_key)
+
+    return jsonify(results={str(k) : v for k, v in results.items()})
@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from flask import current_app
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event
+from app.models import Topic, Question
+import pickle
+import threading
+import time
+
+#marker in a session's pending invalidations meaning "every tenant"
+ALL_TENANTS = object()
+
+def entry_size(value):
+    '''Approximate memory cost of a cached value in bytes.'''
+
+    return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+class _Partition:
+    '''LRU cache for a single tenant, bounded by bytes rather than count.
+    Entries older than ttl seconds are treated as missing; 0 keeps them
+    until evicted or invalidated.
+    '''
+
+    def __init__(self, quota, ttl=0):
+        self.quota = quota
+        self.ttl = ttl
+        self.used = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        item = self.entries.get(key)
+        if item is None:
+            return None
+
+        if self.ttl and time.monotonic() - item[2] > self.ttl:
+            self.discard(key)
+            return None
+
+        self.entries.move_to_end(key)
+        return item[0]
+
+    def set(self, key, value):
+        size = entry_size(value)
+
+        #never let one value flush the tenant's whole working set
+        if size > self.quota:
+            return
+
+        self.discard(key)
+        self.entries[key] = (value, size, time.monotonic())
+        self.used += size
+
+        while self.used > self.quota:
+            _, (_, evicted, _) = self.entries.popitem(last=False)
+            self.used -= evicted
+
+    def discard(self, key):
+        item = self.entries.pop(key, None)
+        if item is not None:
+            self.used -= item[1]
+
+class TenantCache:
+    '''Flask extension for caching query results per tenant. Each tenant has
+    its own LRU partition and byte quota, so eviction caused by one tenant
+    only ever removes that tenant's entries.
+
+    Quotas come from TENANT_CACHE_BYTES, overridable per tenant through the
+    TENANT_CACHE_QUOTAS dict. A tenant's partition is dropped whenever a
+    commit in this process touches its questions or topics. Writes made
+    elsewhere (other workers, cli scripts, raw sql) aren't seen, so entries
+    also expire after TENANT_CACHE_TTL seconds; 0 disables expiry, which is
+    only safe for a single process that makes every write through the ORM.
+    '''
+
+    def init_app(self, app):
+        app.extensions['tenant_cache'] = ({}, threading.Lock())
+
+        if not event.contains(SignallingSession, 'after_flush',
+                                _collect_tenants):
+            event.listen(SignallingSession, 'after_flush', _collect_tenants)
+            event.listen(SignallingSession, 'do_orm_execute', _collect_bulk)
+            event.listen(SignallingSession, 'after_commit', _invalidate)
+            event.listen(SignallingSession, 'after_soft_rollback',
+                                _discard_tenants)
+
+    def _state(self, app=None):
+        return (app or current_app).extensions['tenant_cache']
+
+    def _partition(self, partitions, tenant, app=None):
+        partition = partitions.get(tenant)
+        if partition is None:
+            config = (app or current_app).config
+            quota = config.get('TENANT_CACHE_QUOTAS', {})\
+                        .get(tenant, config['TENANT_CACHE_BYTES'])
+            partition = partitions[tenant] = _Partition(quota,
+                                            config.get('TENANT_CACHE_TTL', 0))
+        return partition
+
+    def get(self, tenant, key):
+        partitions, lock = self._state()
+        with lock:
+            partition = partitions.get(tenant)
+            return partition.get(key) if partition else None
+
+    def set(self, tenant, key, value):
+        partitions, lock = self._state()
+        with lock:
+            self._partition(partitions, tenant).set(key, value)
+
+    def get_or_set(self, tenant, key, loader):
+        value = self.get(tenant, key)
+        if value is None:
+            value = loader()
+            self.set(tenant, key, value)
+        return value
+
+    def usage(self, tenant):
+        partitions, lock = self._state()
+        with lock:
+            partition = partitions.get(tenant)
+            return partition.used if partition else 0
+
+    def invalidate(self, tenant=ALL_TENANTS, app=None):
+        _drop(app or current_app, tenant)
+
+def _drop(app, tenant):
+    partitions, lock = app.extensions['tenant_cache']
+    with lock:
+        if tenant is ALL_TENANTS:
+            partitions.clear()
+        else:
+            partitions.pop(tenant, None)
+
+def _pending(session):
+    return session.info.setdefault('tenant_cache_pending', set())
+
+def _collect_tenants(session, flush_context):
+    pending = _pending(session)
+
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, (Question, Topic)):
+            pending.add(obj.tenant or ALL_TENANTS)
+
+def _collect_bulk(orm_execute_state):
+    '''query.update()/delete() skip the unit of work, and which tenants they
+    hit isn't known without re-running their criteria.
+    '''
+
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        _pending(orm_execute_state.session).add(ALL_TENANTS)
+
+def _invalidate(session):
+    pending = session.info.pop('tenant_cache_pending', None)
+    if not pending:
+        return
+
+    if ALL_TENANTS in pending:
+        _drop(session.app, ALL_TENANTS)
+    else:
+        for tenant in pending:
+            _drop(session.app, tenant)
+
+def _discard_tenants(session, previous_transaction):
+    session.info.pop('tenant_cache_pending', None)
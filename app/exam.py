@@ -0,0 +1,164 @@
+from flask import current_app
+from flask_session.sessions import RedisSessionInterface, \
+                                MemcachedSessionInterface, \
+                                FileSystemSessionInterface
+import heapq
+import itertools
+import threading
+import time
+
+class TimerHeap:
+    '''Min-heap of (due time, run id) w/ lazy deletion. Rescheduling a run
+    just pushes a new entry; the superseded one is skipped when it surfaces.
+    Finding due runs costs O(log n) each, never a scan of all runs, and the
+    heap is compacted when stale entries outnumber live ones.
+    '''
+
+    def __init__(self):
+        self.heap = []
+        self.due = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self.due)
+
+    def schedule(self, run_id, when):
+        self.due[run_id] = when
+        heapq.heappush(self.heap, (when, next(self._seq), run_id))
+
+        if len(self.heap) > 2 * len(self.due) + 64:
+            self.compact()
+
+    def cancel(self, run_id):
+        self.due.pop(run_id, None)
+
+    def compact(self):
+        self.heap = [e for e in self.heap if self.due.get(e[2]) == e[0]]
+        heapq.heapify(self.heap)
+
+    def next_due(self):
+        '''Time of the earliest live entry, or None.'''
+
+        while self.heap:
+            when, _, run_id = self.heap[0]
+            if self.due.get(run_id) == when:
+                return when
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now):
+        '''Removes and returns the ids of every run due at or before now.'''
+
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            when, _, run_id = heapq.heappop(self.heap)
+            if self.due.get(run_id) == when:
+                del self.due[run_id]
+                expired.append(run_id)
+        return expired
+
+def _session_store(iface):
+    '''(load, delete) by key for the key-value session backends. Others
+    (mongodb, sqlalchemy) expire their own rows and aren't swept.
+    '''
+
+    if isinstance(iface, RedisSessionInterface):
+        load = lambda k : _loads(iface, iface.redis.get(k))
+        return load, iface.redis.delete
+    if isinstance(iface, MemcachedSessionInterface):
+        load = lambda k : _loads(iface, iface.client.get(k))
+        return load, iface.client.delete
+    if isinstance(iface, FileSystemSessionInterface):
+        return iface.cache.get, iface.cache.delete
+    return None
+
+def _loads(iface, raw):
+    return iface.serializer.loads(raw) if raw else None
+
+def reclaim_run(app, sid, now):
+    '''Deletes an abandoned run's server-side session. Another worker may
+    have served the run since it was scheduled here, so the stored
+    'reclaim_at' is checked first rather than trusting our own timer. A
+    session without one has since started an untimed run and is kept.
+    '''
+
+    store = _session_store(app.session_interface)
+    if store is None:
+        return False
+
+    load, delete = store
+    key = app.session_interface.key_prefix + sid
+    data = load(key)
+
+    if data is None or 'reclaim_at' not in data or data['reclaim_at'] > now:
+        return False
+
+    delete(key)
+    return True
+
+class ExamSweeper:
+    '''Flask extension that reclaims abandoned timed exam runs. Each served
+    round (re)schedules its run EXAM_ABANDON_SECONDS after the round's
+    deadline; one background thread sleeps until the earliest entry is due,
+    so idle cost doesn't grow w/ the number of concurrent exam takers.
+    '''
+
+    def init_app(self, app):
+        app.extensions['exam_sweeper'] = {'timers' : TimerHeap(),
+                                          'cond' : threading.Condition(),
+                                          'thread' : None}
+
+    def _state(self, app=None):
+        return (app or current_app).extensions['exam_sweeper']
+
+    def schedule(self, sid, when, app=None):
+        app = app or current_app._get_current_object()
+        state = self._state(app)
+
+        with state['cond']:
+            earliest = state['timers'].next_due()
+            state['timers'].schedule(sid, when)
+
+            if state['thread'] is None:
+                state['thread'] = threading.Thread(target=self._run,
+                                    args=(app,), name='exam-sweeper',
+                                    daemon=True)
+                state['thread'].start()
+            elif earliest is None or when < earliest:
+                state['cond'].notify()
+
+    def cancel(self, sid, app=None):
+        state = self._state(app)
+        with state['cond']:
+            state['timers'].cancel(sid)
+
+    def sweep(self, app, now=None):
+        '''Reclaims every run due by now. Returns the number deleted.'''
+
+        now = time.time() if now is None else now
+        state = self._state(app)
+
+        with state['cond']:
+            due = state['timers'].pop_due(now)
+
+        reclaimed = 0
+        for sid in due:
+            try:
+                reclaimed += reclaim_run(app, sid, now)
+            except Exception:
+                app.logger.exception('failed to reclaim exam run')
+        return reclaimed
+
+    def _run(self, app):
+        state = self._state(app)
+        max_wait = app.config['EXAM_SWEEP_MAX_WAIT']
+
+        while True:
+            with state['cond']:
+                when = state['timers'].next_due()
+                wait = max_wait if when is None else when - time.time()
+                if wait > 0:
+                    state['cond'].wait(min(wait, max_wait))
+                    continue
+
+            self.sweep(app)
@@ -1,5 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_session import Session
+from app.index import QuestionIndex
+from app.cache import TenantCache
+from app.exam import ExamSweeper
 
 db = SQLAlchemy()
 sess = Session()
+search_index = QuestionIndex()
+cache = TenantCache()
+exam_sweeper = ExamSweeper()
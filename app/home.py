@@ -1,15 +1,24 @@
 from flask import Blueprint, render_template, abort, session, request
-from app.extensions import db
+from app.extensions import db, cache, exam_sweeper
 from app.models import Topic, Question
+from app.query import parse_query, QueryError
+from app.tenants import current_tenant
 import json
 import random
 
 home_bp = Blueprint('home', __name__)
 
-def get_topics():
+def get_topics(tenant=None):
     #TODO only return those associated with 1+ questions?
-    results = db.session.query(Topic).all()
-    return [r.name for r in results]
+    tenant = tenant or current_tenant()
+
+    def load():
+        results = db.session.query(Topic.name)\
+                    .filter(Topic.tenant == tenant)\
+                    .all()
+        return [r[0] for r in results]
+
+    return cache.get_or_set(tenant, 'topics', load)
 
 def process_form(form):
     ''' Extracts quiz setup info from form.'''
@@ -23,21 +32,27 @@ def process_form(form):
     
     return selected
 
-def generate_id_list(topiclist, randomize = False):
+def generate_id_list(topiclist, randomize = False, tenant = None):
     '''Finds all questions matching user settings and creates randomized
     ordering for future queries by primary key in blocks of a predetermined
-    size.
+    size. The id list is cached per tenant; see TenantCache for how long it
+    can lag writes made by other processes.
     '''
-   
-    #stackoverflow.com/questions/6474989
-    result = db.session.query(Question.id)\
-                .filter(Question.topics.any(Topic.name.in_(topiclist)))\
-                .all()
+    tenant = tenant or current_tenant()
+
+    def load():
+        #stackoverflow.com/questions/6474989
+        result = db.session.query(Question.id)\
+                    .filter(Question.tenant == tenant)\
+                    .filter(Question.topics.any(Topic.name.in_(topiclist)))\
+                    .all()
+        return [v[0] for v in result]
     
-    if len(result) < 1:
-        return [] 
+    #cached list is shared, so always hand out a copy
+    _ids = list(cache.get_or_set(tenant, ('ids', frozenset(topiclist)), load))
     
-    _ids = [v[0] for v in result] 
+    if len(_ids) < 1:
+        return [] 
 
     if randomize is True:
         random.shuffle(_ids)
@@ -51,22 +66,46 @@ def quiz_setup():
     '''
     
     session.clear() 
+    session['tenant'] = current_tenant()
+
+    #the session id outlives clear(), so drop any timer left by a timed run;
+    #a new timed run schedules its own when its first round is served
+    sid = getattr(session, 'sid', None)
+    if sid:
+        exam_sweeper.cancel(sid)
     
-    try:
-        form = request.form 
-        topics = process_form(form)
-    
-        #TODO validation error or 400? blank submission should be OK client side
-        if len(topics) == 0:
+    form = request.form
+    query = form.get('query', '').strip()
+
+    #query mode: only the validated query string is stored; rounds are then
+    #paged from the db by get_questions rather than held as an id list
+    if query:
+        try:
+            parse_query(query)
+        except QueryError:
             abort(400)
 
-    except:
-        abort(400)
+        session['query'] = query
+        session['last_id'] = 0
+
+    else:
+        try:
+            topics = process_form(form)
+        
+            #TODO validation error or 400? blank submission should be OK client side
+            if len(topics) == 0:
+                abort(400)
 
-    session['question_ids'] = generate_id_list(topics)
+        except:
+            abort(400)
+
+        session['question_ids'] = generate_id_list(topics)
     
     #TODO temp -> make this user selected w/ a default from config
     session['block_size'] = 20
+
+    #each round gets a deadline when served; see quiz.get_questions
+    session['timed'] = 'timed' in form
     
     return render_template('portal.html')
 
@@ -0,0 +1,378 @@
+from collections import Counter
+from flask import current_app
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import selectinload
+from app.models import Topic, Question
+from app.qtypes import QTYPES
+import heapq
+import math
+import re
+import threading
+import time
+
+TOKEN_RGX = re.compile(r"\w+")
+
+def tokenize(text):
+    '''Lowercased word tokens of a piece of question or choice text.'''
+
+    return TOKEN_RGX.findall(text.lower()) if text else []
+
+def document_text(question):
+    '''All searchable text for a question: its prompt plus any choices.'''
+
+    parts = [question.text]
+
+    qt = QTYPES.get(question.qtype)
+    if qt is not None:
+        parts.append(qt.choice_text(question))
+
+    return ' '.join(p for p in parts if p)
+
+class InvertedIndex:
+    '''In-memory inverted index over question text and choices.
+
+    Postings map a token to {question id : term frequency}; a separate doc
+    table keeps each question's tokens and topic names so a question can be
+    re-indexed or removed without scanning every posting list. Queries are
+    AND-ed across terms and ranked with a basic tf-idf.
+    '''
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}
+        self.built = False
+        self.built_at = None
+        self.stale = False
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, qid, text, topics=()):
+        '''Adds or replaces the entry for a single question.'''
+
+        self.remove(qid)
+
+        #doc goes in before postings and comes out after them, so a search
+        #running in another thread never finds an id w/o its doc
+        counts = Counter(tokenize(text))
+        self.docs[qid] = (tuple(counts), frozenset(topics))
+
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[qid] = tf
+
+    def remove(self, qid):
+        doc = self.docs.get(qid)
+        if doc is None:
+            return
+
+        for token in doc[0]:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(qid, None)
+            if not posting:
+                self.postings.pop(token, None)
+
+        self.docs.pop(qid, None)
+
+    def clear(self):
+        self.postings = {}
+        self.docs = {}
+        self.built = False
+        self.built_at = None
+        self.stale = False
+
+    def _intersect(self, query):
+        '''(postings of each query term, ids containing every term).'''
+
+        terms = set(tokenize(query))
+        if not terms:
+            return [], set()
+
+        postings = [self.postings.get(t) for t in terms]
+        if not all(postings):
+            return [], set()
+
+        #intersect starting from the rarest term to keep candidate sets small
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates.intersection_update(p)
+            if not candidates:
+                break
+
+        return postings, candidates
+
+    def matching(self, query):
+        '''Unranked set of ids of questions containing every query term.'''
+
+        return self._intersect(query)[1]
+
+    def search(self, query, topics=None, page=1, per_page=20):
+        '''Returns (total matches, [(question id, score), ...]) for the
+        requested page. Only the top page*per_page hits are ever sorted.
+        '''
+
+        postings, candidates = self._intersect(query)
+        if not candidates:
+            return 0, []
+
+        if topics:
+            topics = set(topics)
+            candidates = {qid for qid in candidates
+                            if not topics.isdisjoint(
+                                self.docs.get(qid, ((), ()))[1])}
+
+        n_docs = len(self.docs)
+        idfs = [(p, math.log(1 + n_docs / max(len(p), 1))) for p in postings]
+
+        #.get since a concurrent commit may remove an id mid-search
+        scored = ((sum(p.get(qid, 0) * idf for p, idf in idfs), qid)
+                    for qid in candidates)
+
+        #ties broken by lowest id so ordering is stable between pages
+        top = heapq.nsmallest(page * per_page, scored,
+                                key=lambda s: (-s[0], s[1]))
+        hits = [(qid, score) for score, qid in top[(page - 1) * per_page:]]
+
+        return len(candidates), hits
+
+def _snapshot(question):
+    return (question.tenant, question.id, document_text(question),
+                [t.name for t in question.topics])
+
+class QuestionIndex:
+    '''Flask extension holding one InvertedIndex per tenant, so each
+    customer's bank is searched and sized independently. An index is built
+    from the database on first use and afterwards kept current by listening
+    to session flushes, applying the changes only once the transaction
+    commits. Bulk query.delete()/update() calls can't be followed row by
+    row, so they mark every index stale instead.
+
+    Rebuilds never touch the index being searched: a fresh one is built
+    aside, under a per-tenant lock so only one thread builds at a time, and
+    swapped in with one assignment. Commits made meanwhile are replayed onto
+    it first.
+
+    Indexes live in process memory, so only the process that commits a change
+    sees it applied; other workers, cli scripts and raw sql writes go unseen.
+    To bound that staleness a background thread rebuilds stale indexes and
+    any older than SEARCH_INDEX_MAX_AGE seconds. With 0 there's no thread and
+    stale indexes are rebuilt by their next search, which is only safe for a
+    single process that makes every write through the ORM.
+    '''
+
+    def init_app(self, app):
+        app.extensions['question_index'] = {'indexes' : {},
+                                            'building' : {},
+                                            'locks' : {},
+                                            'lock' : threading.Lock(),
+                                            'wake' : threading.Event(),
+                                            'refresher' : None}
+
+        if not event.contains(SignallingSession, 'after_flush',
+                                _collect_changes):
+            event.listen(SignallingSession, 'after_flush', _collect_changes)
+            event.listen(SignallingSession, 'do_orm_execute', _collect_bulk)
+            event.listen(SignallingSession, 'after_commit', _apply_changes)
+            event.listen(SignallingSession, 'after_soft_rollback',
+                                _discard_changes)
+
+    def _state(self, app=None):
+        return (app or current_app).extensions['question_index']
+
+    def get_index(self, tenant, app=None):
+        state = self._state(app)
+        with state['lock']:
+            return state['indexes'].setdefault(tenant, InvertedIndex())
+
+    def rebuild(self, session, tenant, app=None, needed=None):
+        '''Builds a new index for the tenant and swaps it in. If needed is
+        given it's checked against the current index once this thread holds
+        the tenant's build lock, so threads that queued behind another's
+        rebuild can take its result rather than repeat it.
+        '''
+
+        state = self._state(app)
+
+        with state['lock']:
+            build_lock = state['locks'].setdefault(tenant, threading.Lock())
+
+        with build_lock:
+            current = self.get_index(tenant, app)
+            if needed is not None and not needed(current):
+                return current
+
+            with state['lock']:
+                state['building'][tenant] = []
+
+            try:
+                index = InvertedIndex()
+                built_at = time.monotonic()
+
+                #one query per registered type so subtype columns come w/ each
+                for qt in QTYPES.values():
+                    questions = session.query(qt.model)\
+                                    .options(selectinload(qt.model.topics))\
+                                    .filter(qt.model.tenant == tenant)\
+                                    .all()
+
+                    for q in questions:
+                        index.add(*_snapshot(q)[1:])
+
+                index.built = True
+                index.built_at = built_at
+
+                with state['lock']:
+                    for change in state['building'][tenant]:
+                        _apply_change(index, change)
+                    state['indexes'][tenant] = index
+            finally:
+                with state['lock']:
+                    state['building'].pop(tenant, None)
+
+        return index
+
+    def ensure_built(self, session, tenant, app=None):
+        '''The tenant's index, built first if it never has been. Stale or
+        old indexes are left to the refresher thread when there is one.
+        '''
+
+        app = app or current_app._get_current_object()
+        index = self.get_index(tenant, app)
+
+        if app.config.get('SEARCH_INDEX_MAX_AGE'):
+            self._start_refresher(app)
+            needed = lambda i : not i.built
+        else:
+            needed = lambda i : not i.built or i.stale
+
+        if needed(index):
+            index = self.rebuild(session, tenant, app, needed)
+
+        return index
+
+    def refresh(self, app, now=None):
+        '''Rebuilds every built index that is stale or older than
+        SEARCH_INDEX_MAX_AGE. Returns the number rebuilt.
+        '''
+
+        state = self._state(app)
+        db = app.extensions['sqlalchemy'].db
+        max_age = app.config.get('SEARCH_INDEX_MAX_AGE')
+        now = time.monotonic() if now is None else now
+
+        def due(index):
+            return index.built and (index.stale or
+                        (max_age and now - index.built_at > max_age))
+
+        with state['lock']:
+            tenants = [t for t, i in state['indexes'].items() if due(i)]
+
+        refreshed = 0
+        for tenant in tenants:
+            try:
+                with app.app_context():
+                    self.rebuild(db.session, tenant, app, due)
+                    db.session.remove()
+                refreshed += 1
+            except Exception:
+                app.logger.exception('search index refresh failed')
+        return refreshed
+
+    def _start_refresher(self, app):
+        state = self._state(app)
+        if state['refresher'] is not None:
+            return
+
+        with state['lock']:
+            if state['refresher'] is None:
+                state['refresher'] = threading.Thread(target=self._run,
+                                        args=(app,), name='index-refresher',
+                                        daemon=True)
+                state['refresher'].start()
+
+    def _run(self, app):
+        state = self._state(app)
+
+        while True:
+            #checks a few times per max age; bulk writes wake it at once
+            max_age = app.config.get('SEARCH_INDEX_MAX_AGE') or 60
+            state['wake'].wait(max(max_age / 4, 1))
+            state['wake'].clear()
+            self.refresh(app)
+
+def _pending(session):
+    return session.info.setdefault('question_index_pending', {})
+
+def _collect_changes(session, flush_context):
+    '''Snapshots changed questions while their state is still loaded. A topic
+    rename changes the filter value of every question tagged with it.
+    '''
+
+    pending = _pending(session)
+
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Question):
+            tenant, qid, text, topics = _snapshot(obj)
+            pending[(tenant, qid)] = (text, topics)
+        elif isinstance(obj, Topic) and \
+                inspect(obj).attrs.name.history.has_changes():
+            for q in obj.questions:
+                tenant, qid, text, topics = _snapshot(q)
+                pending[(tenant, qid)] = (text, topics)
+
+    for obj in session.deleted:
+        if isinstance(obj, Question):
+            pending[(obj.tenant, obj.id)] = None
+
+def _collect_bulk(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['question_index_stale'] = True
+
+#marks an index stale when replayed after a rebuild; see _apply_change
+STALE = object()
+
+def _apply_change(index, change):
+    if change is STALE:
+        index.stale = True
+        return
+
+    qid, doc = change
+    if doc is None:
+        index.remove(qid)
+    else:
+        index.add(qid, *doc)
+
+def _apply_changes(session):
+    pending = session.info.pop('question_index_pending', None)
+    stale = session.info.pop('question_index_stale', False)
+    state = session.app.extensions.get('question_index')
+
+    if state is None or not (pending or stale):
+        return
+
+    with state['lock']:
+        if stale:
+            for index in state['indexes'].values():
+                index.stale = True
+            for changes in state['building'].values():
+                changes.append(STALE)
+            state['wake'].set()
+            return
+
+        for (tenant, qid), doc in pending.items():
+            #an index being rebuilt may have read the db before this commit
+            if tenant in state['building']:
+                state['building'][tenant].append((qid, doc))
+
+            index = state['indexes'].get(tenant)
+
+            #unbuilt index will pick up committed rows when it is built
+            if index is not None and index.built:
+                _apply_change(index, (qid, doc))
+
+def _discard_changes(session, previous_transaction):
+    session.info.pop('question_index_pending', None)
+    session.info.pop('question_index_stale', None)
@@ -0,0 +1,43 @@
+"""Additional question types
+
+Revision ID: 5b2f0c8e1a47
+Revises: d3e99f84ed5b
+Create Date: 2026-10-19 10:12:41.207318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2f0c8e1a47'
+down_revision = 'd3e99f84ed5b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('true_false',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('answer', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['questions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('fill_in',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('answer', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['questions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('ordering',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('items', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['id'], ['questions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('ordering')
+    op.drop_table('fill_in')
+    op.drop_table('true_false')
@@ -0,0 +1,33 @@
+"""Tenant scoped question banks
+
+Revision ID: 9c41d7e2b3f0
+Revises: 5b2f0c8e1a47
+Create Date: 2026-10-19 14:03:27.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d7e2b3f0'
+down_revision = '5b2f0c8e1a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    #existing rows all become part of the default tenant's bank
+    op.add_column('questions', sa.Column('tenant', sa.String(), 
+                    nullable=False, server_default='default'))
+    op.add_column('topics', sa.Column('tenant', sa.String(), 
+                    nullable=False, server_default='default'))
+    op.create_index('ix_questions_tenant_id', 'questions', ['tenant', 'id'])
+    op.create_index('ix_topics_tenant_name', 'topics', ['tenant', 'name'])
+
+
+def downgrade():
+    op.drop_index('ix_topics_tenant_name', table_name='topics')
+    op.drop_index('ix_questions_tenant_id', table_name='questions')
+    op.drop_column('topics', 'tenant')
+    op.drop_column('questions', 'tenant')
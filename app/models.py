@@ -1,9 +1,15 @@
-from sqlalchemy import Table, Column, Integer, String, ForeignKey
+from sqlalchemy import Table, Column, Index, Integer, String, Boolean, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+#questions and topics belong to one customer's bank; rows created without one
+#go to the default tenant so single-tenant deployments need not care. Requests
+#without a tenant resolve to this same name (see app.tenants); it is also the
+#server default in the tenant migration, so it is deliberately not configurable
+DEFAULT_TENANT = 'default'
+
 #Note: no cascade delete on either question or topic b/c they exist independent
 #of one another. See: docs.sqlalchemy.org/en/14/orm/cascades.html#delete 
 question_topic_association = Table(
@@ -23,12 +29,19 @@ class Question(Base):
     __tablename__ = 'questions'
     
     id = Column(Integer, primary_key=True)
+    tenant = Column(String, nullable=False, default=DEFAULT_TENANT,
+                        server_default=DEFAULT_TENANT)
     text = Column(String, nullable=False)
     qtype = Column(String, nullable=False)
     topics = relationship("Topic", 
                         secondary="question_topics",
                         back_populates="questions")
 
+    #every hot query filters on tenant first, and keyset paging walks ids
+    __table_args__ = (
+        Index('ix_questions_tenant_id', 'tenant', 'id'),
+    )
+
     __mapper_args__ = {
         'polymorphic_identity' : 'question',
         'polymorphic_on' : qtype
@@ -53,6 +66,50 @@ class MultipleChoice(Question):
         'polymorphic_identity' : 'multiple_choice',
     }
 
+class TrueFalse(Question):
+    '''A statement the user marks as either true or false.'''
+
+    __tablename__ = 'true_false'
+
+    id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
+    
+    answer = Column(Boolean, nullable=False)
+
+    __mapper_args__ = {
+        'polymorphic_identity' : 'true_false',
+    }
+
+class FillIn(Question):
+    '''Free text answer, e.g. the expansion of an acronym. Matching ignores
+    case and surrounding/repeated whitespace.
+    '''
+
+    __tablename__ = 'fill_in'
+
+    id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
+    
+    answer = Column(String, nullable=False)
+
+    __mapper_args__ = {
+        'polymorphic_identity' : 'fill_in',
+    }
+
+class Ordering(Question):
+    '''Items the user must put in order, e.g. OSI layers or handshake steps.
+
+    "items" is a comma-separated list stored in the correct order.
+    '''
+
+    __tablename__ = 'ordering'
+
+    id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
+    
+    items = Column(String, nullable=False)
+
+    __mapper_args__ = {
+        'polymorphic_identity' : 'ordering',
+    }
+
 class Topic(Base):
     '''Categories or topics a question may be tagged with.'''
 
@@ -61,7 +118,13 @@ class Topic(Base):
     __tablename__ = 'topics'
 
     id = Column(Integer, primary_key=True)
+    tenant = Column(String, nullable=False, default=DEFAULT_TENANT,
+                        server_default=DEFAULT_TENANT)
     name = Column(String, nullable=False)
     questions = relationship("Question", 
                             secondary="question_topics",
                             back_populates="topics")
+
+    __table_args__ = (
+        Index('ix_topics_tenant_name', 'tenant', 'name'),
+    )
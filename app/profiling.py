@@ -0,0 +1,168 @@
+from collections import Counter
+from werkzeug.wsgi import ClosingIterator
+import glob
+import os
+import re
+import sys
+import threading
+import time
+
+MAX_DEPTH = 128
+
+#capture filenames start w/ their ring buffer slot, see SamplingProfiler.save
+SLOT_RGX = re.compile(r"^(\d+)-")
+
+def frame_stack(frame):
+    '''Collapsed-stack frames for a thread, root first, as "module:function".'''
+
+    stack = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        stack.append('{}:{}'.format(module, code.co_name))
+        frame = frame.f_back
+
+    stack.reverse()
+    return tuple(stack)
+
+class SamplingProfiler:
+    '''WSGI middleware that samples the stack of every in-flight request from
+    a single background thread every `interval` seconds. Samples cost nothing
+    in the request thread itself; when a request finishes they are thrown
+    away unless it took longer than `threshold_ms`, in which case they're
+    written out in collapsed-stack format (flamegraph.pl, speedscope).
+
+    Captures go to a ring buffer of `max_captures` files in `directory`; the
+    oldest slot is overwritten first.
+    '''
+
+    def __init__(self, wsgi_app, directory, interval=0.005, threshold_ms=1000,
+                    max_captures=50):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.max_captures = max_captures
+
+        os.makedirs(directory, exist_ok=True)
+        self._slot = self._next_slot()
+
+        #thread id -> Counter of stacks, for requests currently being served
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+
+    def _next_slot(self):
+        '''Continues after the newest existing capture across restarts.
+        Files in the directory that aren't named like a capture are ignored.
+        '''
+
+        captures = []
+        for path in glob.glob(os.path.join(self.directory, '*.collapsed')):
+            m = SLOT_RGX.match(os.path.basename(path))
+            if m:
+                captures.append((os.path.getmtime(path), int(m.group(1))))
+
+        if not captures:
+            return 0
+
+        return (max(captures)[1] + 1) % self.max_captures
+
+    def _ensure_sampler(self):
+        if self._sampler is None:
+            with self._lock:
+                if self._sampler is None:
+                    self._sampler = threading.Thread(target=self._run,
+                                                name='profiler', daemon=True)
+                    self._sampler.start()
+
+    def _run(self):
+        while True:
+            #sleep until there's at least one request to sample
+            self._wake.wait()
+
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+
+                frames = sys._current_frames()
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[frame_stack(frame)] += 1
+
+                del frames
+
+            time.sleep(self.interval)
+
+    def __call__(self, environ, start_response):
+        self._ensure_sampler()
+
+        thread_id = threading.get_ident()
+        samples = Counter()
+        start = time.perf_counter()
+
+        with self._lock:
+            self._active[thread_id] = samples
+        self._wake.set()
+
+        def finish():
+            #once removed under the lock the sampler can't touch samples again
+            with self._lock:
+                self._active.pop(thread_id, None)
+
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.threshold and samples:
+                self.save(environ, elapsed, samples)
+
+        try:
+            app_iter = self.wsgi_app(environ, start_response)
+        except:
+            finish()
+            raise
+
+        #timing includes streaming the body, which ends when it's closed
+        return ClosingIterator(app_iter, [finish])
+
+    def save(self, environ, elapsed, samples):
+        '''Writes one capture into the next ring buffer slot. The filename
+        carries the slot, time, method, path and duration.
+        '''
+
+        with self._lock:
+            slot = self._slot
+            self._slot = (slot + 1) % self.max_captures
+
+        for old in glob.glob(os.path.join(self.directory,
+                                            '{:03d}-*'.format(slot))):
+            os.remove(old)
+
+        path = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', ''))\
+                    .strip('_')[:40] or 'root'
+        name = '{:03d}-{}-{}-{}-{}ms.collapsed'.format(slot,
+                        time.strftime('%Y%m%dT%H%M%S'),
+                        environ.get('REQUEST_METHOD', 'GET'),
+                        path, int(elapsed * 1000))
+
+        lines = ['{} {}'.format(';'.join(stack), n)
+                    for stack, n in samples.most_common()]
+
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+def init_profiler(app):
+    '''Wraps the app in a SamplingProfiler when PROFILE_REQUESTS is set.'''
+
+    config = app.config
+    if not config.get('PROFILE_REQUESTS'):
+        return None
+
+    profiler = SamplingProfiler(app.wsgi_app,
+                                directory=config['PROFILE_DIR'],
+                                interval=config['PROFILE_INTERVAL'],
+                                threshold_ms=config['PROFILE_THRESHOLD_MS'],
+                                max_captures=config['PROFILE_MAX_CAPTURES'])
+    app.wsgi_app = profiler
+    return profiler
@@ -0,0 +1,152 @@
+from app.models import MultipleChoice, TrueFalse, FillIn, Ordering
+from app.shuffle import shuffle, new_seed
+
+class QuestionType:
+    '''Registry entry for one Question subtype.
+
+    model       - the polymorphic subclass; its table declares the columns
+    prep        - prep(questions, seed) -> list of answer key dicts, one per
+                  question and in the same order. Called once per type per
+                  round; any shuffling must derive from (seed, question id).
+    score       - score(values, keys) -> list of 'correct'/'incorrect' for
+                  the user's raw form values against their answer key dicts
+    choice_text - choice_text(question) -> extra searchable text
+    '''
+
+    def __init__(self, model, prep, score, choice_text):
+        self.model = model
+        self.prep = prep
+        self.score = score
+        self.choice_text = choice_text
+
+#keyed by each model's polymorphic identity, i.e. Question.qtype
+QTYPES = {}
+
+def register_type(model, prep, score, choice_text=lambda q : ''):
+    qtype = model.__mapper__.polymorphic_identity
+    QTYPES[qtype] = QuestionType(model, prep, score, choice_text)
+    return QTYPES[qtype]
+
+#fields of an answer key that reveal the answer; never sent to a client
+ANSWER_FIELDS = ('correct_index', 'answer', 'correct_order')
+
+def public_key(key):
+    '''Copy of an answer key dict w/ only what's needed to display it.'''
+
+    return {k : v for k, v in key.items() if k not in ANSWER_FIELDS}
+
+def _parse_index(value):
+    '''Non-negative int from a form value, or None. str.isdigit alone also
+    passes characters such as superscripts that int() rejects.
+    '''
+
+    return int(value) if value.isascii() and value.isdecimal() else None
+
+def _result(is_correct):
+    return 'correct' if is_correct else 'incorrect'
+
+def _base_key(q):
+    return {'id' : q.id, 'text' : q.text, 'qtype' : q.qtype}
+
+def prep_multichoice(qlist, seed=None):
+    '''Assigns a position for each correct answer in a list of multiple 
+    choice questions. Choice order depends only on the round seed and the
+    question's id, so a round can be re-rendered identically from its seed.
+    '''
+
+    if seed is None:
+        seed = new_seed()
+
+    #keys for both are the question's index; index encoded in html attribute
+    #for the form inputs and parsed upon submission to match w/ answer key
+    answer_key = [None] * len(qlist)
+
+    for q_idx, q in enumerate(qlist):
+
+        #correct answer goes last, then is tracked through the shuffle
+        choices = q.incorrect.split(',')
+        choices.append(q.correct)
+
+        answer_key[q_idx] = _base_key(q)
+        answer_key[q_idx]['correct_index'] = shuffle(choices, seed, q.id,
+                                                    track=len(choices) - 1)
+        answer_key[q_idx]['choices'] = choices
+
+    return answer_key
+
+def score_choice(values, keys):
+    '''Scores any key with a 'correct_index' into its 'choices'.'''
+
+    #check for errors/user tampering with value attribute of input
+    return [_result(_parse_index(v) == k['correct_index'])
+                for v, k in zip(values, keys)]
+
+def prep_truefalse(qlist, seed=None):
+    answer_key = []
+
+    for q in qlist:
+        key = _base_key(q)
+        key['choices'] = ['True', 'False']
+        key['correct_index'] = 0 if q.answer else 1
+        answer_key.append(key)
+
+    return answer_key
+
+def normalize_text(value):
+    return ' '.join(value.split()).casefold()
+
+def prep_fillin(qlist, seed=None):
+    answer_key = []
+
+    for q in qlist:
+        key = _base_key(q)
+        key['answer'] = normalize_text(q.answer)
+        answer_key.append(key)
+
+    return answer_key
+
+def score_fillin(values, keys):
+    return [_result(normalize_text(v) == k['answer'])
+                for v, k in zip(values, keys)]
+
+def prep_ordering(qlist, seed=None):
+    '''Shuffles each question's items for display. 'correct_order' lists the
+    displayed indices in their correct order.
+    '''
+
+    if seed is None:
+        seed = new_seed()
+
+    answer_key = []
+
+    for q in qlist:
+        items = q.items.split(',')
+        idxs = list(range(len(items)))
+        shuffle(idxs, seed, q.id)
+
+        key = _base_key(q)
+        key['choices'] = [items[i] for i in idxs]
+        key['correct_order'] = sorted(range(len(idxs)), key=idxs.__getitem__)
+        answer_key.append(key)
+
+    return answer_key
+
+def score_ordering(values, keys):
+    '''Expects the user's ordering as comma-separated display indices.'''
+
+    results = []
+
+    for v, k in zip(values, keys):
+        parts = v.split(',')
+        order = [_parse_index(p.strip()) for p in parts] \
+                    if len(parts) == len(k['correct_order']) else None
+        results.append(_result(order == k['correct_order']))
+
+    return results
+
+register_type(MultipleChoice, prep_multichoice, score_choice,
+                lambda q : q.correct + ' ' + q.incorrect.replace(',', ' '))
+register_type(TrueFalse, prep_truefalse, score_choice)
+register_type(FillIn, prep_fillin, score_fillin, lambda q : q.answer)
+register_type(Ordering, prep_ordering, score_ordering,
+                lambda q : q.items.replace(',', ' '))
@@ -0,0 +1,229 @@
+from sqlalchemy import and_, or_, not_, bindparam
+from app.extensions import db, search_index
+from app.models import Topic, Question
+from bisect import bisect_right
+import re
+
+class QueryError(ValueError):
+    '''Raised for a quiz query string that can't be parsed.'''
+
+#quoted strings, parens, or bare words optionally prefixed w/ a field name
+TOKEN_RGX = re.compile(r'''\s*(?:(\()|(\))|(?:(\w+):)?(?:"([^"]*)"|([^\s()"]+)))''')
+
+FIELDS = ('topic', 'type', 'text')
+OPERATORS = ('AND', 'OR', 'NOT')
+
+def lex(text):
+    '''Splits a query into ('(' | ')' | 'AND' | 'OR' | 'NOT' | field, value)
+    pairs. Bare words are treated as topic names.
+    '''
+
+    tokens = []
+    pos = 0
+    text = text.strip()
+
+    while pos < len(text):
+        m = TOKEN_RGX.match(text, pos)
+        if m is None or m.end() == pos:
+            raise QueryError('unexpected input at position {}'.format(pos))
+        pos = m.end()
+
+        lparen, rparen, field, quoted, word = m.groups()
+
+        if lparen or rparen:
+            tokens.append((lparen or rparen, None))
+        elif field is None and quoted is None and word in OPERATORS:
+            tokens.append((word, None))
+        else:
+            field = (field or 'topic').lower()
+            if field not in FIELDS:
+                raise QueryError('unknown field "{}"'.format(field))
+            tokens.append((field, quoted if quoted is not None else word))
+
+    return tokens
+
+class _Parser:
+    '''Recursive descent over lexed tokens. Precedence from loosest to
+    tightest is OR, AND, NOT; adjacent terms are implicitly AND-ed.
+    '''
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError('empty query')
+
+        node = self.or_expr()
+        if self.pos != len(self.tokens):
+            raise QueryError('unexpected "{}"'.format(self.peek()))
+        return node
+
+    def or_expr(self):
+        nodes = [self.and_expr()]
+        while self.peek() == 'OR':
+            self.take()
+            nodes.append(self.and_expr())
+        return nodes[0] if len(nodes) == 1 else ('OR', nodes)
+
+    def and_expr(self):
+        nodes = [self.not_expr()]
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.take()
+            nodes.append(self.not_expr())
+        return nodes[0] if len(nodes) == 1 else ('AND', nodes)
+
+    def not_expr(self):
+        if self.peek() == 'NOT':
+            self.take()
+            return ('NOT', self.not_expr())
+        return self.atom()
+
+    def atom(self):
+        kind = self.peek()
+
+        if kind is None:
+            raise QueryError('query ends unexpectedly')
+
+        if kind == '(':
+            self.take()
+            node = self.or_expr()
+            if self.peek() != ')':
+                raise QueryError('unbalanced parenthesis')
+            self.take()
+            return node
+
+        if kind in FIELDS:
+            return self.take()
+
+        raise QueryError('unexpected "{}"'.format(kind))
+
+def parse_query(text):
+    '''Parses a quiz query such as
+        (Routing OR Switching) AND NOT topic:"Legacy Protocols" type:multiple_choice
+    into a nested tuple tree of ('AND'|'OR', [nodes]), ('NOT', node) and
+    (field, value) leaves.
+    '''
+
+    return _Parser(lex(text)).parse()
+
+#most ids any one text: term contributes to a single statement
+TEXT_WINDOW = 500
+
+def _in_ids(ids):
+    #rendered inline; several terms' windows together can pass the bound
+    #parameter limit of older sqlite builds
+    return Question.id.in_(bindparam(None, ids, expanding=True,
+                                        literal_execute=True))
+
+def to_criterion(node, text_ids):
+    '''Compiles a parsed query tree into a single SQLAlchemy filter clause
+    over Question. text_ids(value) must return the ids of questions whose
+    text matches a text: term; they're filtered on by primary key, so text
+    terms never fall back to scanning the questions table.
+    '''
+
+    kind, value = node
+
+    if kind == 'AND':
+        return and_(*[to_criterion(n, text_ids) for n in value])
+    if kind == 'OR':
+        return or_(*[to_criterion(n, text_ids) for n in value])
+    if kind == 'NOT':
+        return not_(to_criterion(value, text_ids))
+    if kind == 'topic':
+        return Question.topics.any(Topic.name == value)
+    if kind == 'type':
+        return Question.qtype == value
+
+    return _in_ids(text_ids(value))
+
+def text_values(node):
+    '''Values of every text: leaf in a parsed query tree.'''
+
+    kind, value = node
+
+    if kind in ('AND', 'OR'):
+        return {v for n in value for v in text_values(n)}
+    if kind == 'NOT':
+        return text_values(value)
+    return {value} if kind == 'text' else set()
+
+def compile_query(text, tenant):
+    '''Compiles a query for one tenant into window(last_id), which returns
+    (criterion, upper): a filter over Question that is exact for ids in
+    (last_id, upper], upper being None when the window is unbounded.
+
+    text: terms are resolved through the tenant's search index, so they
+    match whole words in a question's prompt or choices (every word of a
+    quoted phrase, in any order) rather than substrings. The index is only
+    consulted when the query has a text: term. Each term contributes at most
+    TEXT_WINDOW ids past the cursor, and the window ends where the first
+    term was cut off, so the statement stays small however broad the term.
+    '''
+
+    tree = parse_query(text)
+    values = text_values(tree)
+
+    matches = {}
+    if values:
+        index = search_index.ensure_built(db.session, tenant)
+        matches = {v : sorted(index.matching(v)) for v in values}
+
+    def window(last_id):
+        starts = {v : bisect_right(ids, last_id) for v, ids in matches.items()}
+
+        upper = None
+        for v, ids in matches.items():
+            if len(ids) - starts[v] > TEXT_WINDOW:
+                cut = ids[starts[v] + TEXT_WINDOW - 1]
+                upper = cut if upper is None else min(upper, cut)
+
+        def text_ids(value):
+            ids = matches[value]
+            end = len(ids) if upper is None else bisect_right(ids, upper)
+            return ids[starts[value]:end]
+
+        return to_criterion(tree, text_ids), upper
+
+    return window
+
+def next_block_ids(window, last_id, n, tenant):
+    '''Keyset pagination over a compiled query's matches within one tenant's
+    bank: the next n question ids after last_id in primary key order.
+    Nothing beyond the current block is ever materialized, so a broad query
+    costs the same as a narrow one. A bounded text window that runs out
+    before n matches are found moves on to the next one.
+    '''
+
+    ids = []
+
+    while len(ids) < n:
+        criterion, upper = window(last_id)
+
+        query = db.session.query(Question.id)\
+                    .filter(Question.tenant == tenant)\
+                    .filter(criterion)\
+                    .filter(Question.id > last_id)
+        if upper is not None:
+            query = query.filter(Question.id <= upper)
+
+        want = n - len(ids)
+        result = query.order_by(Question.id).limit(want).all()
+        ids.extend(v[0] for v in result)
+
+        if upper is None or len(result) == want:
+            break
+        last_id = upper
+
+    return ids
@@ -1,56 +1,68 @@
-from flask import Blueprint, session, render_template, abort, request
-from sqlalchemy.orm import with_polymorphic
+from flask import Blueprint, current_app, session, render_template, abort, \
+                    request
 import re
-import random
-from app.extensions import db
-from app.models import Topic, Question, MultipleChoice
-import pytest
+import time
+from app.extensions import db, exam_sweeper
+from app.models import Question
+from app.qtypes import QTYPES
+from app.shuffle import new_seed
+from app.query import compile_query, next_block_ids
+from app.tenants import current_tenant
 
 quiz_bp = Blueprint('quiz', __name__)
 
-def prep_multichoice(qlist):
-    '''Assigns a position for each correct answer in a list of multiple 
-    choice questions.
+def load_round(q_ids, seed, tenant=None):
+    '''Builds the answer key for a round of possibly mixed question types.
+    One lookup finds each question's type, then each type present is loaded
+    with a single query and prepped as a batch. Key order follows q_ids, and
+    the same (q_ids, seed) always produce the same key. Ids outside the
+    tenant's bank are dropped.
     '''
-    
-    #keys for both are the question's index; index encoded in html attribute
-    #for the form inputs and parsed upon submission to match w/ answer key
-    answer_key = [None] * len(qlist)
-   
-    #random.shuffle's 'random' parameter deprecated, otherwise we could simply
-    #shuffle all choices together AND rendering indices w/ the same seed param
-    for q_idx, q in enumerate(qlist):
-
-        orig_choices = q.incorrect.split(',')
-        correct = q.correct
-        orig_choices.append(correct)
-        n_choices = len(orig_choices)
-        
-        idxs = list(range(n_choices))
-        random.shuffle(idxs)
-       
-        answer_key[q_idx] = {'id' : q.id,
-                            'text' : q.text,
-                            'correct_index' : idxs[-1]}
-        
-        out_choices = [None]* (n_choices)
-        for n,i in enumerate(idxs):
-            out_choices[i] = orig_choices[n]
+
+    if not q_ids:
+        return []
+
+    tenant = tenant or current_tenant()
+    rows = db.session.query(Question.id, Question.qtype)\
+                .filter(Question.tenant == tenant)\
+                .filter(Question.id.in_(q_ids))\
+                .all()
+
+    by_type = {}
+    for _id, qtype in rows:
+        by_type.setdefault(qtype, []).append(_id)
+
+    keys = {}
+    for qtype, ids in by_type.items():
+        #TODO log questions w/ an unregistered type; skipped for now
+        if qtype not in QTYPES:
+            continue
+
+        qt = QTYPES[qtype]
+        questions = db.session.query(qt.model)\
+                        .filter(qt.model.id.in_(ids))\
+                        .all()
         
-        answer_key[q_idx]['choices'] = out_choices
+        for q, key in zip(questions, qt.prep(questions, seed)):
+            keys[q.id] = key
 
-    return answer_key
+    return [keys[i] for i in q_ids if i in keys]
 
 def score_input(user_answers, answer_key):
-    '''Compares input with the key created at time of quiz round's generation
+    '''Compares input with the key created at time of quiz round's generation.
+    Answers are grouped by question type and each type's scorer called once.
     '''
-    score = {}
+    grouped = {}
     for q_idx, value in user_answers.items():
-        correct_idx = answer_key[q_idx]['correct_index']
-        
-        #check for errors/user tampering with value attribute of input
-        choice_idx = int(value) if value.isdigit() else None
-        score[q_idx] = 'correct' if choice_idx == correct_idx else 'incorrect'
+        key = answer_key[q_idx]
+        qtype = key.get('qtype', 'multiple_choice')
+        grouped.setdefault(qtype, []).append((q_idx, value, key))
+
+    score = {}
+    for qtype, entries in grouped.items():
+        q_idxs, values, keys = zip(*entries)
+        results = QTYPES[qtype].score(values, keys)
+        score.update(zip(q_idxs, results))
 
     return score
 
@@ -75,6 +87,51 @@ def extract_answers(form):
 
     return answers
 
+def check_run_tenant():
+    '''A quiz run started under one tenant can't be continued under another.'''
+
+    if session.get('tenant', current_tenant()) != current_tenant():
+        abort(400)
+
+def start_round_timer():
+    '''Gives a timed run's new round its deadline, and schedules the run's
+    session to be reclaimed if it's abandoned past that deadline.
+    '''
+
+    config = current_app.config
+
+    session['deadline'] = time.time() + config['EXAM_ROUND_SECONDS']
+    session['reclaim_at'] = session['deadline'] + config['EXAM_ABANDON_SECONDS']
+
+    #only server-side sessions have an id to reclaim
+    sid = getattr(session, 'sid', None)
+    if sid:
+        exam_sweeper.schedule(sid, session['reclaim_at'])
+
+def round_expired():
+    deadline = session.get('deadline')
+    grace = current_app.config['EXAM_GRACE_SECONDS']
+
+    return deadline is not None and time.time() > deadline + grace
+
+def current_round():
+    '''Rebuilds the answer key of the round last served. Only its question
+    ids and seed are kept in the session; choice orders are re-derived.
+    '''
+
+    if 'round_ids' not in session:
+        abort(400)
+
+    q_ids = session['round_ids']
+    answer_key = load_round(q_ids, session['round_seed'])
+
+    #a question deleted since the round was served would shift every later
+    #answer onto the wrong question
+    if len(answer_key) != len(q_ids):
+        abort(409)
+
+    return answer_key
+
 @quiz_bp.route('/submit', methods=['POST'])
 def question_submit():
     '''Processes a round of quiz questions to compare user input with
@@ -85,11 +142,18 @@ def question_submit():
     except:
         abort(400)
     
-    user_answers = extract_answers(form)
-    results = score_input(user_answers, session['answer_key'])
+    check_run_tenant()
+    answer_key = current_round()
+
+    #late submissions of a timed round score nothing, answered or not
+    if session.get('timed') and round_expired():
+        results = {i : 'expired' for i in range(len(answer_key))}
+    else:
+        user_answers = extract_answers(form)
+        results = score_input(user_answers, answer_key)
 
     return render_template('answerpage.html', results=results,
-                                            questions=session['answer_key'])
+                                            questions=answer_key)
 
 @quiz_bp.route('/get', methods=['GET'])
 def get_questions():
@@ -98,27 +162,40 @@ def get_questions():
     '''
     #TODO system controlling access only from form in quiz and one at a time
     #eg. csrf validation  
-    try:
-        idlist = session['question_ids']
-    except:
-        abort(400) 
-    
+    if 'block_size' not in session:
+        abort(400)
+
+    check_run_tenant()
+    tenant = current_tenant()
+
     n = session['block_size']
-    q_ids = idlist[-n:]
     
-    #TODO using in_ vs a join; does it matter w/ sqla a/o our db of choice?
-    polymap = with_polymorphic(Question, MultipleChoice)
-    questions = db.session.query(polymap)\
-                    .filter(Question.id.in_(q_ids))\
-                    .all()
-    
-    answer_key = prep_multichoice(questions)
+    if 'query' in session:
+        window = compile_query(session['query'], tenant)
+        q_ids = next_block_ids(window, session['last_id'], n, tenant)
+        if q_ids:
+            session['last_id'] = q_ids[-1]
+    else:
+        try:
+            idlist = session['question_ids']
+        except:
+            abort(400) 
+        
+        q_ids = idlist[-n:]
+        
+        #remove already-asked questions
+        session['question_ids'] = idlist[:-n or None]
     
-    #remove already-asked questions
-    session['question_ids'] = session['question_ids'][:-n or None]
+    #TODO using in_ vs a join; does it matter w/ sqla a/o our db of choice?
+    seed = new_seed()
+    answer_key = load_round(q_ids, seed, tenant)
     
-    #store active questions for scoring user answers and displaying results
-    session['answer_key'] = answer_key
+    #the round's ids and seed are enough to rebuild its key on submission
+    session['round_ids'] = [k['id'] for k in answer_key]
+    session['round_seed'] = seed
+
+    if session.get('timed'):
+        start_round_timer()
     
     #TODO end quiz if not enough available? Indicate end in jinja context to display?
 
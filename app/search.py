@@ -0,0 +1,55 @@
+from flask import Blueprint, abort, request, jsonify
+from sqlalchemy.orm import selectinload
+from app.extensions import db, search_index
+from app.models import Question
+from app.tenants import current_tenant
+
+search_bp = Blueprint('search', __name__)
+
+MAX_PER_PAGE = 100
+
+def parse_paging(args, default_per_page=20):
+    '''Reads 'page' and 'per_page' query parameters, clamped to sane bounds.'''
+
+    page = args.get('page', 1, type=int) or 1
+    per_page = args.get('per_page', default_per_page, type=int) \
+                    or default_per_page
+
+    return max(page, 1), min(max(per_page, 1), MAX_PER_PAGE)
+
+@search_bp.route('/search', methods=['GET'])
+def search_questions():
+    '''Ranked full-text search over question and choice text, optionally
+    restricted to questions tagged with any of the given 'topic' params.
+    '''
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        abort(400)
+
+    topics = request.args.getlist('topic')
+    page, per_page = parse_paging(request.args)
+
+    tenant = current_tenant()
+    index = search_index.ensure_built(db.session, tenant)
+    total, hits = index.search(query, topics=topics, page=page,
+                                per_page=per_page)
+
+    #only the current page is loaded from the db, in ranked order
+    found = {}
+    if hits:
+        questions = db.session.query(Question)\
+                        .options(selectinload(Question.topics))\
+                        .filter(Question.tenant == tenant)\
+                        .filter(Question.id.in_([qid for qid, _ in hits]))\
+                        .all()
+        found = {q.id : q for q in questions}
+
+    results = [{'id' : qid,
+                'text' : found[qid].text,
+                'topics' : [t.name for t in found[qid].topics],
+                'score' : round(score, 4)}
+                for qid, score in hits if qid in found]
+
+    return jsonify(query=query, page=page, per_page=per_page, total=total,
+                    results=results)
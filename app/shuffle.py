@@ -0,0 +1,52 @@
+import random
+
+MASK64 = (1 << 64) - 1
+
+def mix64(x):
+    '''SplitMix64 finalizer; a cheap, well-distributed 64 bit hash.'''
+
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def new_seed():
+    return random.getrandbits(64)
+
+def question_key(round_seed, question_id):
+    '''Stream key for one question. Its shuffle is a pure function of this
+    key, so no generator state is kept between questions or requests.
+    '''
+
+    return mix64(round_seed ^ mix64(question_id))
+
+#below this many bits left, draws start to bias towards low indices
+REFILL = 1 << 32
+
+def shuffle(items, round_seed, question_id, track=None):
+    '''In-place Fisher-Yates shuffle of items, reproducible from
+    (round_seed, question_id). If track is an index into the original list,
+    returns that element's position after shuffling.
+
+    Each swap index is taken from one 64 bit hash by repeated divmod, so a
+    choice-sized list costs a single mix64 call. This is ~5x cheaper than
+    seeding a random.Random per question and close to random.shuffle.
+    '''
+
+    key = question_key(round_seed, question_id)
+    bits, counter = key, 0
+
+    for i in range(len(items) - 1, 0, -1):
+        if bits < REFILL:
+            counter += 1
+            bits = mix64((key + counter) & MASK64)
+
+        bits, j = divmod(bits, i + 1)
+        items[i], items[j] = items[j], items[i]
+
+        if track == i:
+            track = j
+        elif track == j:
+            track = i
+
+    return track
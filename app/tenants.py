@@ -0,0 +1,44 @@
+from flask import current_app, g, request, abort, has_request_context
+from app.models import DEFAULT_TENANT
+import re
+
+TENANT_RGX = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+#infrastructure endpoints that answer for the whole worker, not a tenant
+EXEMPT_ENDPOINTS = ('warmup.readiness',)
+
+def resolve_tenant():
+    '''before_request hook that picks the tenant for this request from the
+    TENANT_HEADER header, falling back to the default tenant. With no header
+    configured (the default) every request is the default tenant's, since
+    nothing here can tell a proxy's header from one a client sent. Unknown
+    tenants get a 404 when TENANTS is set.
+    '''
+
+    if request.endpoint in EXEMPT_ENDPOINTS:
+        return
+
+    config = current_app.config
+    header = config.get('TENANT_HEADER')
+    tenant = request.headers.get(header) if header else None
+
+    if not tenant:
+        tenant = DEFAULT_TENANT
+    elif not TENANT_RGX.match(tenant):
+        abort(400)
+
+    allowed = config.get('TENANTS')
+    if allowed and tenant not in allowed:
+        abort(404)
+
+    g.tenant = tenant
+
+def current_tenant():
+    '''Tenant of the current request, or the default tenant outside of one
+    (e.g. cli commands).
+    '''
+
+    if has_request_context() and 'tenant' in g:
+        return g.tenant
+
+    return DEFAULT_TENANT
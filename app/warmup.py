@@ -0,0 +1,128 @@
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from app.extensions import db, search_index
+from app.home import get_topics
+from app.models import DEFAULT_TENANT
+import click
+import threading
+import time
+
+warmup_bp = Blueprint('warmup', __name__)
+
+TEMPLATES = ('index.html', 'portal.html', 'quiz.html', 'answerpage.html')
+
+def open_connections(app):
+    '''Fills the pool so the first requests don't pay for connecting. Uses
+    WARMUP_CONNECTIONS, defaulting to the pool's size where it has one.
+    '''
+
+    pool = db.engine.pool
+    n = app.config.get('WARMUP_CONNECTIONS') or \
+            (pool.size() if hasattr(pool, 'size') else 1)
+
+    conns = []
+    try:
+        for _ in range(n):
+            conn = db.engine.connect()
+            conns.append(conn)
+            conn.execute(text('SELECT 1'))
+    finally:
+        #closing returns each connection to the pool, still open
+        for conn in conns:
+            conn.close()
+
+def _warm_up_once(app):
+    with app.app_context():
+        try:
+            configure_mappers()
+
+            #get_template compiles and caches in the app's jinja env
+            for name in TEMPLATES:
+                app.jinja_env.get_template(name)
+
+            open_connections(app)
+
+            for tenant in app.config['TENANTS'] or [DEFAULT_TENANT]:
+                get_topics(tenant)
+                search_index.ensure_built(db.session, tenant, app)
+        finally:
+            db.session.remove()
+
+def warm_up(app):
+    '''Does the one-off work otherwise done by each worker's first requests:
+    mapper configuration (incl. the polymorphic Question hierarchy), template
+    compilation, connection pool fill, and each tenant's topic list and
+    search index. Marks the app ready on success.
+
+    Failures, e.g. a database that isn't up yet at boot, are retried
+    WARMUP_RETRIES times, waiting WARMUP_BACKOFF seconds at first and twice
+    as long each time after, up to WARMUP_BACKOFF_MAX. Only then is the app
+    reported as failed.
+    '''
+
+    state = app.extensions['warmup']
+    config = app.config
+    delay = config['WARMUP_BACKOFF']
+
+    for attempt in range(config['WARMUP_RETRIES'] + 1):
+        if attempt:
+            time.sleep(delay)
+            delay = min(delay * 2, config['WARMUP_BACKOFF_MAX'])
+
+        try:
+            _warm_up_once(app)
+        except Exception:
+            #details go to the log only; /ready is reachable by anyone
+            app.logger.exception('warm-up attempt %d failed', attempt + 1)
+        else:
+            state['failed'] = False
+            state['ready'].set()
+            return
+
+    state['failed'] = True
+
+def in_cli_command():
+    '''True while a flask cli command other than `flask run` is creating the
+    app; such one-off processes never serve requests.
+    '''
+
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.info_name != 'run'
+
+def start_warmup(app):
+    '''Called by create_app. WARMUP may be 'background' (own thread, so the
+    worker starts listening immediately but reports unready), 'sync' (blocks
+    create_app) or off, in which case the app is ready at once. Runs per
+    worker process, so don't combine 'background' w/ a preloading server.
+    Skipped for cli commands such as `flask bundles build`.
+    '''
+
+    mode = app.config.get('WARMUP')
+    if in_cli_command():
+        mode = 'off'
+
+    state = app.extensions['warmup'] = {'ready' : threading.Event(),
+                                        'failed' : False}
+
+    if mode == 'background':
+        thread = threading.Thread(target=warm_up, args=(app,),
+                                    name='warmup', daemon=True)
+        state['thread'] = thread
+        thread.start()
+    elif mode == 'sync':
+        warm_up(app)
+    else:
+        state['ready'].set()
+
+@warmup_bp.route('/ready', methods=['GET'])
+def readiness():
+    '''Load balancer readiness check; 503 until warm-up has finished.'''
+
+    state = current_app.extensions['warmup']
+
+    if state['ready'].is_set():
+        return jsonify(status='ready')
+
+    status = 'failed' if state['failed'] else 'warming'
+    return jsonify(status=status), 503
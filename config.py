@@ -11,9 +11,60 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SESSION_TYPE = os.environ.get('SESSION_TYPE', 'null')
+    
+    #search indexes are per process; each is rebuilt once older than this
+    #many seconds so writes made by other workers show up. 0 never rebuilds
+    SEARCH_INDEX_MAX_AGE = int(os.environ.get('SEARCH_INDEX_MAX_AGE', 300))
+
+    #prebuilt offline rounds are public; their answer keys must not be
+    BUNDLE_DIR = os.environ.get('BUNDLE_DIR', os.path.join(basedir, 'bundles'))
+    BUNDLE_KEY_DIR = os.environ.get('BUNDLE_KEY_DIR',
+                                    os.path.join(basedir, 'bundle_keys'))
+
+    #single tenant (app.models.DEFAULT_TENANT) unless TENANT_HEADER is set.
+    #Only set it behind a proxy that overwrites that header on every request,
+    #as any client can send it. TENANTS (comma-separated) restricts which
+    #tenants exist, otherwise any well-formed name is allowed
+    TENANT_HEADER = os.environ.get('TENANT_HEADER') or None
+    TENANTS = [t for t in os.environ.get('TENANTS', '').split(',') if t]
+    
+    #per-tenant memory quota for cached query results, in bytes
+    TENANT_CACHE_BYTES = int(os.environ.get('TENANT_CACHE_BYTES', 8 * 2**20))
+    TENANT_CACHE_QUOTAS = {}
+
+    #cached results only see this process's commits; expire them so writes
+    #from other workers show up within this many seconds. 0 never expires
+    TENANT_CACHE_TTL = int(os.environ.get('TENANT_CACHE_TTL', 60))
+
+    #'background', 'sync' or 'off'; see app.warmup.start_warmup
+    WARMUP = os.environ.get('WARMUP', 'background')
+    WARMUP_CONNECTIONS = int(os.environ.get('WARMUP_CONNECTIONS', 0))
+    WARMUP_RETRIES = int(os.environ.get('WARMUP_RETRIES', 8))
+    WARMUP_BACKOFF = float(os.environ.get('WARMUP_BACKOFF', 1))
+    WARMUP_BACKOFF_MAX = float(os.environ.get('WARMUP_BACKOFF_MAX', 30))
+
+    #opt-in sampling profiler; requests slower than the threshold are saved
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '') == '1'
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(basedir, 'profiles'))
+    PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+    PROFILE_THRESHOLD_MS = int(os.environ.get('PROFILE_THRESHOLD_MS', 1000))
+    PROFILE_MAX_CAPTURES = int(os.environ.get('PROFILE_MAX_CAPTURES', 50))
+
+    #timed exam mode: time allowed per round, slack for in-flight submits,
+    #and how long after a missed deadline a run's session is reclaimed
+    EXAM_ROUND_SECONDS = int(os.environ.get('EXAM_ROUND_SECONDS', 15 * 60))
+    EXAM_GRACE_SECONDS = int(os.environ.get('EXAM_GRACE_SECONDS', 15))
+    EXAM_ABANDON_SECONDS = int(os.environ.get('EXAM_ABANDON_SECONDS', 30 * 60))
+    EXAM_SWEEP_MAX_WAIT = 60
 
 
 class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI', 'sqlite://')
+    
+    #tests create tables after the app; warm-up is run explicitly where needed
+    WARMUP = 'off'
+
+    #no background index refresher; tests call search_index.refresh
+    SEARCH_INDEX_MAX_AGE = 0
 
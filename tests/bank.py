@@ -0,0 +1,132 @@
+'''Synthetic question bank generator for stress and property tests.
+
+Rows are written w/ Core executemany inserts and explicit primary keys, so a
+bank of 100k+ questions loads in seconds and is cheap to throw away by
+rolling back the connection's transaction (see bank_session). Explicit ids
+also sidestep sqlite's autoincrement reuse that made function scoped ORM
+fixtures collide.
+'''
+
+from contextlib import contextmanager
+from itertools import accumulate
+from app.extensions import db, cache
+from app.models import Question, MultipleChoice, Topic, \
+                        question_topic_association, DEFAULT_TENANT
+import random
+
+CHUNK = 10000
+
+class Bank:
+    '''What was generated, kept in memory as an oracle for the tests.
+
+    question_ids    - every question id, ascending
+    topic_names     - topic names, most to least popular
+    topic_questions - topic name -> set of question ids tagged with it
+    choices         - question id -> (correct, [incorrect, ...])
+    '''
+
+    def __init__(self):
+        self.question_ids = []
+        self.topic_names = []
+        self.topic_questions = {}
+        self.choices = {}
+
+    def ids_for(self, topics):
+        return set().union(*(self.topic_questions[t] for t in topics))
+
+def _insert(connection, table, rows):
+    for i in range(0, len(rows), CHUNK):
+        connection.execute(table.insert(), rows[i:i + CHUNK])
+
+def generate_bank(connection, n_questions, n_topics=25, topic_skew=1.1,
+                    n_choices=(2, 6), topics_per_question=(1, 3),
+                    tenant=DEFAULT_TENANT, seed=0, start_id=1):
+    '''Bulk inserts a multiple choice bank and returns its Bank.
+
+    Topic popularity follows a Zipf-like 1/rank**topic_skew curve, so a
+    skew of 0 spreads questions evenly and larger values pile them onto the
+    first few topics. Each question gets a uniform random number of
+    incorrect choices and topics within the given inclusive ranges.
+    '''
+
+    rng = random.Random(seed)
+    bank = Bank()
+
+    bank.topic_names = ['topic{:03d}'.format(n) for n in range(n_topics)]
+    topic_ids = {name : start_id + n for n, name in enumerate(bank.topic_names)}
+    bank.topic_questions = {name : set() for name in bank.topic_names}
+    cum_weights = list(accumulate(1 / (rank + 1) ** topic_skew
+                                    for rank in range(n_topics)))
+
+    questions, multiple_choice, tags = [], [], []
+
+    for qid in range(start_id, start_id + n_questions):
+        n_tags = rng.randint(*topics_per_question)
+        topics = set(rng.choices(bank.topic_names, cum_weights=cum_weights,
+                                    k=n_tags))
+
+        correct = 'q{}c'.format(qid)
+        incorrect = ['q{}i{}'.format(qid, n)
+                        for n in range(rng.randint(*n_choices) - 1)]
+
+        questions.append({'id' : qid,
+                          'tenant' : tenant,
+                          'text' : 'question {} on {}'.format(qid,
+                                                        ' '.join(topics)),
+                          'qtype' : 'multiple_choice'})
+        multiple_choice.append({'id' : qid,
+                                'correct' : correct,
+                                'incorrect' : ','.join(incorrect)})
+
+        for name in topics:
+            tags.append({'question_id' : qid, 'topic_id' : topic_ids[name]})
+            bank.topic_questions[name].add(qid)
+
+        bank.question_ids.append(qid)
+        bank.choices[qid] = (correct, incorrect)
+
+    _insert(connection, Topic.__table__,
+            [{'id' : _id, 'tenant' : tenant, 'name' : name}
+                for name, _id in topic_ids.items()])
+    _insert(connection, Question.__table__, questions)
+    _insert(connection, MultipleChoice.__table__, multiple_choice)
+    _insert(connection, question_topic_association, tags)
+
+    return bank
+
+@contextmanager
+def bank_session(app, n_questions, **kwargs):
+    '''Pushes an app context and binds this thread's db.session to one
+    connection in an open transaction, generates a bank on it and yields the
+    Bank. All of it is rolled back on exit, leaving the database as it was,
+    and whichever session the thread had before is restored. db.session
+    itself is never replaced, so other apps and threads are unaffected.
+
+    The tenant cache is cleared on entry and exit since Core inserts and the
+    rollback bypass the ORM events that normally invalidate it.
+    '''
+
+    ctx = app.app_context()
+    ctx.push()
+
+    connection = db.engine.connect()
+    transaction = connection.begin()
+
+    #scoped_session keeps one session per thread; put ours in its place
+    registry = db.session.registry
+    previous = registry() if registry.has() else None
+    registry.set(db.create_session({'bind' : connection,
+                                    'binds' : {},
+                                    'query_cls' : db.Query})())
+    try:
+        bank = generate_bank(connection, n_questions, **kwargs)
+        cache.invalidate()
+        yield bank
+    finally:
+        db.session.remove()
+        if previous is not None:
+            registry.set(previous)
+        transaction.rollback()
+        connection.close()
+        cache.invalidate()
+        ctx.pop()
@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+import pytest
+from app import create_app
+from app.models import Base, Topic, Question, MultipleChoice
+from app.extensions import db
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    '''App instance with database and throwaway bundle directories'''
+
+    application = create_app(config_type='Test')
+    application.config['BUNDLE_DIR'] = str(tmp_path_factory.mktemp('bundles'))
+    application.config['BUNDLE_KEY_DIR'] = str(tmp_path_factory.mktemp('keys'))
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+    
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='function')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='module')
+def built(app):
+    '''Five questions tagged 'Topic1' built into three bundles of two.'''
+
+    t1 = Topic(name='Topic1')
+
+    with app.app_context():
+        for n in range(5):
+            q = MultipleChoice(text='question {}'.format(n),
+                               correct='correct{}'.format(n),
+                               incorrect='choice1,choice2,choice3')
+            q.topics.append(t1)
+            db.session.add(q)
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['bundles', 'build',
+                                                '-t', 'Topic1',
+                                                '-n', '3', '-s', '2'])
+    assert result.exit_code == 0, result.output
+
+    with open(os.path.join(app.config['BUNDLE_DIR'], 'default',
+                           'manifest.json')) as f:
+        manifest = json.load(f)
+
+    yield manifest['Topic1']
+
+    with app.app_context():
+        db.session.query(Topic).delete()
+        db.session.query(Question).delete()
+        db.session.commit()
+
+def test_build_command(app, built):
+
+    assert 1 <= len(built) <= 3
+
+    for digest in built:
+        path = os.path.join(app.config['BUNDLE_DIR'], 'default',
+                            digest + '.json.gz')
+        with gzip.open(path) as f:
+            bundle = json.load(f)
+
+        assert len(bundle['questions']) == 2
+        for q in bundle['questions']:
+            assert 'correct_index' not in q
+            assert len(q['choices']) == 4
+
+        path = os.path.join(app.config['BUNDLE_KEY_DIR'], 'default',
+                            digest + '.json')
+        with open(path) as f:
+            key = json.load(f)
+
+        assert [q['id'] for q in key['answer_key']] == \
+                [q['id'] for q in bundle['questions']]
+
+def test_get_bundle(app, client, built):
+
+    digest = built[0]
+    response = client.get('/bundles/{}.json'.format(digest),
+                            headers={'Accept-Encoding' : 'gzip'})
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'questions' in json.loads(gzip.decompress(response.data))
+
+    response = client.get('/bundles/{}.json'.format(digest),
+                            headers={'If-None-Match' : '"{}"'.format(digest),
+                                     'Accept-Encoding' : 'gzip'})
+    assert response.status_code == 304
+
+    response = client.get('/bundles/{}.json'.format(digest))
+    assert 'Content-Encoding' not in response.headers
+    assert 'questions' in response.get_json()
+
+    assert client.get('/bundles/{}.json'.format('0' * 64)).status_code == 404
+    assert client.get('/bundles/..%2Fmanifest.json').status_code == 404
+
+def test_manifest_route(client, built):
+
+    response = client.get('/bundles/manifest.json')
+
+    assert response.status_code == 200
+    assert response.get_json()['Topic1'] == built
+
+def test_submit_bundle(app, client, built):
+
+    digest = built[0]
+    with open(os.path.join(app.config['BUNDLE_KEY_DIR'], 'default',
+                           digest + '.json')) as f:
+        answer_key = json.load(f)['answer_key']
+
+    wrong = (answer_key[1]['correct_index'] + 1) % 4
+    form = {'q0' : str(answer_key[0]['correct_index']),
+            'q1' : str(wrong),
+            'q9' : '0'}
+
+    response = client.post('/bundles/{}/submit'.format(digest), data=form)
+
+    assert response.status_code == 200
+    assert response.get_json()['results'] == {'0' : 'correct',
+                                              '1' : 'incorrect'}
+
+    response = client.post('/bundles/{}/submit'.format('f' * 64), data=form)
+    assert response.status_code == 404
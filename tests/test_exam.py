@@ -0,0 +1,181 @@
+import time
+import pytest
+from flask import template_rendered, session
+from app import create_app
+from app.models import Base, Topic, Question, MultipleChoice
+from app.extensions import db, sess, exam_sweeper
+from app.exam import TimerHeap, reclaim_run
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    '''App instance with database and filesystem sessions, so runs have a
+    server-side session to reclaim.
+    '''
+
+    application = create_app(config_type='Test')
+    application.config['SESSION_TYPE'] = 'filesystem'
+    application.config['SESSION_FILE_DIR'] = str(tmp_path_factory.mktemp('s'))
+    sess.init_app(application)
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+    
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='function')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='function')
+def captured_templates(app):
+    '''Taken verbatim from Flask's documentation on signals:
+    flask.palletsprojects.com/en/2.1.x/signals/#subscribing-to-signals
+    '''
+    recorded = []
+    def record(sender, template, context, **extra):
+        recorded.append((template, context))
+    template_rendered.connect(record, app)
+    try:
+        yield recorded
+    finally:
+        template_rendered.disconnect(record, app)
+
+@pytest.fixture(scope='module')
+def db_questions(app):
+    '''Two questions tagged 'Topic1'.'''
+
+    t1 = Topic(name='Topic1')
+
+    with app.app_context():
+        for n in range(2):
+            q = MultipleChoice(text='question {}'.format(n), correct='a',
+                               incorrect='b,c')
+            q.topics.append(t1)
+            db.session.add(q)
+        db.session.commit()
+
+    yield
+
+    with app.app_context():
+        db.session.query(Topic).delete()
+        db.session.query(Question).delete()
+        db.session.commit()
+
+def test_timer_heap():
+
+    timers = TimerHeap()
+    timers.schedule('a', 10)
+    timers.schedule('b', 5)
+    timers.schedule('c', 20)
+    
+    #rescheduled and cancelled runs leave stale entries that are skipped
+    timers.schedule('b', 30)
+    timers.cancel('c')
+
+    assert timers.next_due() == 10
+    assert timers.pop_due(25) == ['a']
+    assert timers.pop_due(29) == []
+    assert timers.pop_due(30) == ['b']
+    assert len(timers) == 0 and timers.next_due() is None
+
+def test_timer_heap_compaction():
+
+    timers = TimerHeap()
+    for n in range(1000):
+        timers.schedule('run', n)
+
+    #one live run can't grow the heap without bound
+    assert len(timers) == 1
+    assert len(timers.heap) <= 2 * len(timers) + 65
+
+def test_timed_round_deadline(app, client, captured_templates, db_questions):
+
+    client.post('/quiz', data={'Topic1' : '', 'timed' : ''})
+    
+    before = time.time()
+    client.get('/get')
+    _, context = captured_templates[-1]
+    answer_key = context['questions']
+
+    with client.session_transaction() as session:
+        assert session['timed'] is True
+        assert session['deadline'] >= before + app.config['EXAM_ROUND_SECONDS']
+
+    form = {'q0' : str(answer_key[0]['correct_index'])}
+    client.post('/submit', data=form)
+    _, context = captured_templates[-1]
+    assert context['results'] == {0 : 'correct'}
+
+    with client.session_transaction() as session:
+        session['deadline'] = time.time() - app.config['EXAM_GRACE_SECONDS'] - 1
+
+    client.post('/submit', data=form)
+    _, context = captured_templates[-1]
+    assert context['results'] == {0 : 'expired', 1 : 'expired'}
+
+def test_untimed_round(client, db_questions):
+
+    client.post('/quiz', data={'Topic1' : ''})
+    client.get('/get')
+
+    with client.session_transaction() as session:
+        assert session['timed'] is False
+        assert 'deadline' not in session
+
+def test_abandoned_run_reclaimed(app, client, db_questions):
+
+    client.post('/quiz', data={'Topic1' : '', 'timed' : ''})
+    client.get('/get')
+
+    with client.session_transaction() as session:
+        reclaim_at = session['reclaim_at']
+
+    #not yet due
+    assert exam_sweeper.sweep(app, now=reclaim_at - 1) == 0
+    assert client.post('/submit', data={}).status_code == 200
+
+    assert exam_sweeper.sweep(app, now=reclaim_at + 1) >= 1
+
+    #session data is gone, so the run can't be continued
+    assert client.post('/submit', data={}).status_code == 400
+    assert client.get('/get').status_code == 400
+
+def test_rescheduled_run_not_reclaimed(app, client, db_questions):
+
+    client.post('/quiz', data={'Topic1' : '', 'timed' : ''})
+    client.get('/get')
+
+    with client.session_transaction() as session:
+        first = session['reclaim_at']
+        
+        #as if another worker served a later round of this run
+        session['reclaim_at'] = first + 1000
+
+    exam_sweeper.sweep(app, now=first + 1)
+    
+    assert client.post('/submit', data={}).status_code == 200
+
+def test_untimed_run_on_same_sid_kept(app, client, db_questions):
+
+    client.post('/quiz', data={'Topic1' : '', 'timed' : ''})
+    client.get('/get')
+
+    with client.session_transaction() as sess:
+        far_future = sess['reclaim_at'] + 10**6
+
+    #session id survives session.clear(), so the new run shares it
+    with client:
+        client.post('/quiz', data={'Topic1' : ''})
+        sid = session.sid
+
+    assert exam_sweeper.sweep(app, now=far_future) == 0
+    assert client.get('/get').status_code == 200
+
+    #even if a stale timer still fires, a run w/o reclaim_at isn't deleted
+    assert reclaim_run(app, sid, far_future) is False
+    assert client.get('/get').status_code == 200
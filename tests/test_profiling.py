@@ -0,0 +1,95 @@
+import os
+import time
+import pytest
+from app import create_app
+from app.profiling import SamplingProfiler, init_profiler
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+@pytest.fixture(scope='function')
+def app(tmp_path):
+    '''Bare app w/ profiling on and a route slow enough to be captured'''
+
+    application = create_app(config_type='Test')
+    application.config.update(PROFILE_REQUESTS=True,
+                               PROFILE_DIR=str(tmp_path),
+                               PROFILE_INTERVAL=0.001,
+                               PROFILE_THRESHOLD_MS=50,
+                               PROFILE_MAX_CAPTURES=2)
+
+    def slow_view():
+        busy(0.1)
+        return 'slow'
+
+    application.add_url_rule('/slow', 'slow', slow_view)
+    application.add_url_rule('/fast', 'fast', lambda : 'fast')
+
+    init_profiler(application)
+
+    return application
+
+def test_profiler_opt_in():
+
+    application = create_app(config_type='Test')
+
+    assert init_profiler(application) is None
+    assert not isinstance(application.wsgi_app, SamplingProfiler)
+
+def test_slow_request_captured(app, tmp_path):
+
+    #buffered so the client closes the body, as a real server would
+    client = app.test_client()
+
+    assert client.get('/fast', buffered=True).data == b'fast'
+    assert os.listdir(tmp_path) == []
+
+    assert client.get('/slow', buffered=True).data == b'slow'
+
+    captures = os.listdir(tmp_path)
+    assert len(captures) == 1
+    assert captures[0].startswith('000-') and '-GET-slow-' in captures[0]
+
+    with open(os.path.join(tmp_path, captures[0])) as f:
+        lines = f.read().splitlines()
+
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert 'tests.test_profiling:busy' in stack.split(';')
+
+def test_capture_ring_buffer(app, tmp_path):
+
+    client = app.test_client()
+    for _ in range(3):
+        client.get('/slow', buffered=True)
+
+    #third capture overwrote the first slot
+    captures = sorted(os.listdir(tmp_path))
+    assert len(captures) == 2
+    assert [c[:3] for c in captures] == ['000', '001']
+
+    profiler = SamplingProfiler(lambda e, s : [], str(tmp_path),
+                                max_captures=2)
+    assert profiler._next_slot() == 1
+
+def test_next_slot_ignores_stray_files(tmp_path):
+
+    files = (('notes.collapsed', 300),
+             ('1204-x-GET-a-5ms.collapsed', 200),
+             ('0007-x-GET-b-5ms.collapsed', 100))
+
+    for name, mtime in files:
+        path = tmp_path / name
+        path.write_text('')
+        os.utime(path, (mtime, mtime))
+
+    #newest capture is slot 1204, past what a 3 digit prefix can hold
+    profiler = SamplingProfiler(lambda e, s : [], str(tmp_path),
+                                max_captures=2000)
+    assert profiler._next_slot() == 1205
+
+    (tmp_path / '1204-x-GET-a-5ms.collapsed').unlink()
+    (tmp_path / '0007-x-GET-b-5ms.collapsed').unlink()
+    assert profiler._next_slot() == 0
@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import event
+from app import create_app
+from app.models import Base, Question, MultipleChoice, TrueFalse, \
+                        FillIn, Ordering
+from app.extensions import db
+from app.qtypes import QTYPES, prep_truefalse, prep_fillin, prep_ordering, \
+                        score_choice, score_fillin, score_ordering
+from app.quiz import load_round, score_input
+
+@pytest.fixture(scope='module')
+def app():
+    '''App instance with database for functional tests'''
+
+    application = create_app(config_type='Test')
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+    
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='module')
+def db_questions(app):
+    '''Two questions of each registered type, ids 1-8 in insertion order.'''
+
+    questions = [
+        MultipleChoice(text='mc 1', correct='a', incorrect='b,c'),
+        TrueFalse(text='tf 1', answer=True),
+        FillIn(text='What does OSPF stand for?',
+               answer='Open Shortest Path First'),
+        Ordering(text='order 1', items='physical,data link,network'),
+        MultipleChoice(text='mc 2', correct='d', incorrect='e,f'),
+        TrueFalse(text='tf 2', answer=False),
+        FillIn(text='What does ARP stand for?',
+               answer='Address Resolution Protocol'),
+        Ordering(text='order 2', items='syn,syn-ack,ack'),
+    ]
+
+    with app.app_context():
+        db.session.add_all(questions)
+        db.session.commit()
+
+    yield
+
+    with app.app_context():
+        for qt in QTYPES.values():
+            db.session.query(qt.model).delete()
+        db.session.query(Question).delete()
+        db.session.commit()
+
+def test_registry():
+
+    assert set(QTYPES) == {'multiple_choice', 'true_false', 'fill_in',
+                           'ordering'}
+    assert QTYPES['true_false'].model is TrueFalse
+
+def test_truefalse():
+
+    keys = prep_truefalse([TrueFalse(id=1, text='t', qtype='true_false',
+                                     answer=False)])
+
+    assert keys[0]['choices'][keys[0]['correct_index']] == 'False'
+    assert score_choice(['1', '0', 'x'], keys * 3) == \
+            ['correct', 'incorrect', 'incorrect']
+
+    #tampered values int() can't parse, even ones isdigit() accepts
+    assert score_choice(['\u00b9', '-1', ' 1', ''], keys * 4) == \
+            ['incorrect'] * 4
+
+def test_fillin():
+
+    keys = prep_fillin([FillIn(id=1, text='t', qtype='fill_in',
+                               answer='Open Shortest Path First')])
+
+    assert score_fillin(['  open shortest  path FIRST', 'OSPF'], keys * 2) == \
+            ['correct', 'incorrect']
+
+def test_ordering():
+
+    items = 'physical,data link,network,transport'
+    keys = prep_ordering([Ordering(id=1, text='t', qtype='ordering',
+                                   items=items)])
+    key = keys[0]
+
+    #putting the displayed choices in correct_order restores the original
+    assert [key['choices'][i] for i in key['correct_order']] == \
+            items.split(',')
+
+    answer = ','.join(str(i) for i in key['correct_order'])
+    assert score_ordering([answer, '0,1', 'a,b,c,d'], keys * 3) == \
+            ['correct', 'incorrect', 'incorrect']
+
+    tampered = answer[:-1] + '\u00b2'
+    assert score_ordering([tampered], keys) == ['incorrect']
+
+def test_load_round_mixed(app, db_questions):
+
+    statements = []
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            keys = load_round([8, 3, 1, 6, 2, 5, 7, 4], 1)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+    #type lookup plus one query per type, regardless of round size
+    assert len(statements) == 1 + 4
+    assert [k['id'] for k in keys] == [8, 3, 1, 6, 2, 5, 7, 4]
+    assert [k['qtype'] for k in keys[:4]] == \
+            ['ordering', 'fill_in', 'multiple_choice', 'true_false']
+
+def test_score_mixed(app, db_questions):
+
+    with app.app_context():
+        keys = load_round([1, 2, 3, 4], 1)
+
+    order = ','.join(str(i) for i in keys[3]['correct_order'])
+    answers = {0 : str(keys[0]['correct_index']),
+               1 : '1',
+               2 : 'open shortest path first',
+               3 : order}
+
+    score = score_input(answers, keys)
+
+    assert score == {0 : 'correct', 1 : 'incorrect', 2 : 'correct',
+                     3 : 'correct'}
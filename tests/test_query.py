@@ -0,0 +1,179 @@
+import pytest
+from flask import template_rendered, session
+from app import create_app
+from app.models import Base, Topic, Question, MultipleChoice
+from app.extensions import db, search_index
+from app import query
+from app.query import parse_query, compile_query, next_block_ids, QueryError
+
+@pytest.fixture(scope='module')
+def app():
+    '''App instance with database for functional tests'''
+
+    application = create_app(config_type='Test')
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+    
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='function')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='function')
+def captured_templates(app):
+    '''Taken verbatim from Flask's documentation on signals:
+    flask.palletsprojects.com/en/2.1.x/signals/#subscribing-to-signals
+    '''
+    recorded = []
+    def record(sender, template, context, **extra):
+        recorded.append((template, context))
+    template_rendered.connect(record, app)
+    try:
+        yield recorded
+    finally:
+        template_rendered.disconnect(record, app)
+
+@pytest.fixture(scope='module')
+def db_questions(app):
+    '''Five questions: 1-3 tagged 'Routing', 2 and 4 tagged 'Legacy', 5 tagged
+    'Switching'. Only question 3 mentions OSPF in its text.
+    '''
+
+    routing = Topic(name='Routing')
+    legacy = Topic(name='Legacy')
+    switching = Topic(name='Switching')
+
+    tags = [(routing,), (routing, legacy), (routing,), (legacy,), (switching,)]
+    
+    with app.app_context():
+        for n, topics in enumerate(tags, start=1):
+            text = 'OSPF question' if n == 3 else 'question {}'.format(n)
+            q = MultipleChoice(text=text,
+                               qtype='multiple_choice',
+                               correct='correct',
+                               incorrect='choice1,choice2')
+            q.topics.extend(topics)
+            db.session.add(q)
+        db.session.commit()
+
+    yield
+
+    with app.app_context():
+        db.session.query(Topic).delete()
+        db.session.query(Question).delete()
+        db.session.commit()
+
+def test_parse_query():
+
+    assert parse_query('Routing') == ('topic', 'Routing')
+    
+    #NOT binds tighter than AND, AND tighter than OR, adjacency is AND
+    assert parse_query('A OR B NOT C') == \
+            ('OR', [('topic', 'A'),
+                    ('AND', [('topic', 'B'), ('NOT', ('topic', 'C'))])])
+    
+    assert parse_query('(A OR B) AND type:multiple_choice text:"link state"')\
+            == ('AND', [('OR', [('topic', 'A'), ('topic', 'B')]),
+                        ('type', 'multiple_choice'),
+                        ('text', 'link state')])
+
+    assert parse_query('topic:"Legacy Protocols"') == \
+            ('topic', 'Legacy Protocols')
+
+    for bad in ('', 'A AND', '(A OR B', 'A)', 'NOT', 'color:blue', 'A "B'):
+        with pytest.raises(QueryError):
+            parse_query(bad)
+
+def test_compiled_query(app, db_questions):
+
+    def matches(text):
+        window = compile_query(text, 'default')
+        return next_block_ids(window, 0, 100, 'default')
+
+    with app.app_context():
+        assert matches('Routing') == [1, 2, 3]
+        assert matches('Routing AND NOT Legacy') == [1, 3]
+        assert matches('Legacy OR Switching') == [2, 4, 5]
+        assert matches('Routing text:ospf') == [3]
+        assert matches('type:true_false') == []
+        assert matches('text:"100%"') == []
+
+        #whole words from the prompt or choices, not substrings
+        assert matches('text:"question ospf"') == [3]
+        assert matches('text:choice1') == [1, 2, 3, 4, 5]
+        assert matches('text:osp') == []
+
+def test_keyset_paging(app, db_questions):
+
+    with app.app_context():
+        window = compile_query('Routing OR Legacy OR Switching', 'default')
+
+        assert next_block_ids(window, 0, 2, 'default') == [1, 2]
+        assert next_block_ids(window, 2, 2, 'default') == [3, 4]
+        assert next_block_ids(window, 4, 2, 'default') == [5]
+        assert next_block_ids(window, 5, 2, 'default') == []
+
+def test_topic_query_skips_index(app, db_questions):
+
+    #forget the index earlier text queries built
+    app.extensions['question_index']['indexes'].clear()
+
+    with app.app_context():
+        window = compile_query('Routing OR Legacy', 'default')
+
+        assert not search_index.get_index('default').built
+        assert next_block_ids(window, 0, 100, 'default') == [1, 2, 3, 4]
+
+def test_text_window(app, db_questions, monkeypatch):
+
+    #each term lists at most 2 ids per statement
+    monkeypatch.setattr(query, 'TEXT_WINDOW', 2)
+
+    with app.app_context():
+        window = compile_query('text:question', 'default')
+
+        criterion, upper = window(0)
+        assert upper == 2
+        criterion, upper = window(3)
+        assert upper is None
+
+        #paging crosses windows w/o skipping or repeating ids
+        assert next_block_ids(window, 0, 3, 'default') == [1, 2, 3]
+        assert next_block_ids(window, 3, 3, 'default') == [4, 5]
+
+        window = compile_query('Routing AND NOT text:ospf', 'default')
+        assert next_block_ids(window, 0, 100, 'default') == [1, 2]
+
+def test_query_quiz_rounds(app, client, captured_templates, db_questions):
+
+    with client:
+        response = client.post('/quiz', data={'query' : 'Routing OR Legacy'})
+
+        assert response.status_code == 200
+        assert session['query'] == 'Routing OR Legacy'
+        assert 'question_ids' not in session
+
+    with client.session_transaction() as sess:
+        sess['block_size'] = 3
+
+    response = client.get('/get')
+    template, context = captured_templates[-1]
+    assert response.status_code == 200
+    assert sorted(q['id'] for q in context['questions']) == [1, 2, 3]
+
+    client.get('/get')
+    template, context = captured_templates[-1]
+    assert [q['id'] for q in context['questions']] == [4]
+
+    with client:
+        response = client.post('/quiz', data={'query' : '(Routing'})
+
+        assert response.status_code == 400
+        assert 'query' not in session
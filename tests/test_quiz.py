@@ -5,7 +5,8 @@ from flask import template_rendered, session
 from app import create_app
 from app.models import Base, Topic, Question, MultipleChoice
 from app.extensions import db
-from app.quiz import prep_multichoice, extract_answers, score_input
+from app.qtypes import prep_multichoice
+from app.quiz import extract_answers, score_input, load_round
 
 @pytest.fixture(scope='module')
 def app():
@@ -176,22 +177,19 @@ def test_quiz_submit(app, client, captured_templates, db_questions):
         qlist = db.session.query(Question)\
             .filter(Question.topics.any(Topic.name.in_(['Topic1','Topic2'])))\
             .all()
-         
-    form = {'q0' : '0' , 'q1': '3'}
-    ans_key = [None] * len(qlist)
-    
-    #dummy data for choices since for this route, it only matters for display
-    for n, q in enumerate(qlist):
-        ans_key[n] = {'id' : q.id,
-                      'text' : q.text,
-                      'correct_index' : n,
-                      'choices' : ['choice0', 'choice1', 'choice2']}
+        q_ids = [q.id for q in qlist]
+        ans_key = load_round(q_ids, 2022, 'default')
     
+    #only the round's ids and seed are stored; the key is rebuilt from them
     with client.session_transaction() as session:
-        session['question_ids'] = [q.id for q in qlist]
         session['block_size'] = len(qlist)
-        session['answer_key'] = ans_key
+        session['round_ids'] = q_ids
+        session['round_seed'] = 2022
+        assert 'answer_key' not in session
     
+    form = {'q0' : str(ans_key[0]['correct_index']),
+            'q1' : str(ans_key[1]['correct_index'] + 1)}
+
     response = client.post('/submit', data=form)
     template, context = captured_templates[0]
 
@@ -201,6 +199,9 @@ def test_quiz_submit(app, client, captured_templates, db_questions):
 
     assert context['questions'] == ans_key
 
-    #for test, correct index was made equal to display index instead of random
     assert context['results'][0] == 'correct'
     assert context['results'][1] == 'incorrect'
+
+def test_quiz_submit_without_round(client):
+
+    assert client.post('/submit', data={'q0' : '0'}).status_code == 400
@@ -0,0 +1,264 @@
+import threading
+import pytest
+from app import create_app
+from app.models import Base, Topic, Question, MultipleChoice
+from app.extensions import db, search_index
+from app.index import InvertedIndex, tokenize
+
+@pytest.fixture(scope='module')
+def app():
+    '''App instance with database for functional tests'''
+
+    application = create_app(config_type='Test')
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+    
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='function')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='module')
+def db_questions(app):
+    '''Two routing questions under 'Routing', one of which is also tagged
+    'Protocols', and a transport question under 'Protocols' only.
+    '''
+
+    t1 = Topic(name='Routing')
+    t2 = Topic(name='Protocols')
+
+    q1 = MultipleChoice(text='Which protocol is a link state routing protocol?',
+                        qtype='multiple_choice',
+                        correct='OSPF',
+                        incorrect='RIP,EIGRP,BGP')
+    q2 = MultipleChoice(text='What is the administrative distance of RIP?',
+                        qtype='multiple_choice',
+                        correct='120',
+                        incorrect='90,110,20')
+    q3 = MultipleChoice(text='Which transport protocol is connectionless?',
+                        qtype='multiple_choice',
+                        correct='UDP',
+                        incorrect='TCP,SCTP')
+
+    q1.topics.extend((t1, t2))
+    q2.topics.append(t1)
+    q3.topics.append(t2)
+
+    with app.app_context():
+        db.session.add_all((q1, q2, q3))
+        db.session.commit()
+
+    yield
+
+    with app.app_context():
+        db.session.query(Topic).delete()
+        db.session.query(Question).delete()
+        db.session.commit()
+
+def test_tokenize():
+
+    assert tokenize('What is OSPF\'s AD? 110, right') == \
+            ['what', 'is', 'ospf', 's', 'ad', '110', 'right']
+    assert tokenize(None) == []
+
+def test_inverted_index_ranking():
+
+    index = InvertedIndex()
+    index.add(1, 'tcp handshake', ['Transport'])
+    index.add(2, 'tcp tcp window', ['Transport'])
+    index.add(3, 'ospf area', ['Routing'])
+
+    total, hits = index.search('TCP')
+    assert total == 2
+    assert [qid for qid, _ in hits] == [2, 1]
+
+    #terms are AND-ed together
+    total, hits = index.search('tcp window')
+    assert total == 1 and hits[0][0] == 2
+
+    assert index.search('tcp', topics=['Routing']) == (0, [])
+    assert index.search('bgp') == (0, [])
+
+    total, hits = index.search('tcp', page=2, per_page=1)
+    assert total == 2
+    assert [qid for qid, _ in hits] == [1]
+
+    index.remove(2)
+    assert index.search('window') == (0, [])
+    assert 'window' not in index.postings
+
+def test_search_route(app, client, db_questions):
+
+    response = client.get('/search', query_string={'q' : 'protocol'})
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data['total'] == 2
+    assert {r['id'] for r in data['results']} == {1, 3}
+
+    #choice text is indexed as well as the question prompt
+    response = client.get('/search', query_string={'q' : 'rip'})
+    assert {r['id'] for r in response.get_json()['results']} == {1, 2}
+
+    response = client.get('/search', query_string={'q' : 'rip', 
+                                                   'topic' : 'Protocols'})
+    assert [r['id'] for r in response.get_json()['results']] == [1]
+
+    response = client.get('/search', query_string={'q' : 'rip',
+                                                   'per_page' : 1,
+                                                   'page' : 2})
+    data = response.get_json()
+    assert data['total'] == 2 and len(data['results']) == 1
+
+    assert client.get('/search').status_code == 400
+
+def test_search_incremental_update(app, client, db_questions):
+
+    client.get('/search', query_string={'q' : 'protocol'})
+
+    with app.app_context():
+        q = MultipleChoice(text='Which port does DNS use?',
+                            qtype='multiple_choice',
+                            correct='53',
+                            incorrect='80,443')
+        db.session.add(q)
+        db.session.commit()
+        new_id = q.id
+
+    response = client.get('/search', query_string={'q' : 'dns'})
+    assert [r['id'] for r in response.get_json()['results']] == [new_id]
+
+    with app.app_context():
+        q = db.session.get(Question, new_id)
+        q.text = 'Which port does DHCP use?'
+        db.session.commit()
+
+    assert client.get('/search', query_string={'q' : 'dns'})\
+                .get_json()['total'] == 0
+    assert client.get('/search', query_string={'q' : 'dhcp'})\
+                .get_json()['total'] == 1
+
+    with app.app_context():
+        q = db.session.get(Question, new_id)
+        db.session.delete(q)
+        db.session.commit()
+
+    assert client.get('/search', query_string={'q' : 'dhcp'})\
+                .get_json()['total'] == 0
+
+def test_search_index_refresh(app, client, db_questions):
+
+    client.get('/search', query_string={'q' : 'protocol'})
+
+    #a write this process never saw, e.g. made by another worker
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(Question.__table__.update()
+                        .where(Question.id == 3)
+                        .values(text='Which transport is reliable?'))
+
+    assert client.get('/search', query_string={'q' : 'reliable'})\
+                .get_json()['total'] == 0
+
+    app.config['SEARCH_INDEX_MAX_AGE'] = 300
+    try:
+        with app.app_context():
+            old = search_index.get_index('default')
+
+            assert search_index.refresh(app, now=old.built_at + 1) == 0
+            assert search_index.refresh(app, now=old.built_at + 301) == 1
+
+            #rebuilt aside and swapped in; the old object is left intact
+            assert search_index.get_index('default') is not old
+            assert old.search('reliable') == (0, [])
+    finally:
+        app.config['SEARCH_INDEX_MAX_AGE'] = 0
+
+    assert client.get('/search', query_string={'q' : 'reliable'})\
+                .get_json()['total'] == 1
+
+def test_search_during_rebuild(app, db_questions):
+
+    with app.app_context():
+        expected = search_index.ensure_built(db.session, 'default')\
+                        .search('which')[0]
+
+    errors, totals = [], set()
+    done = threading.Event()
+
+    def searcher():
+        with app.app_context():
+            while not done.is_set():
+                try:
+                    index = search_index.get_index('default')
+                    totals.add(index.search('which', topics=['Routing',
+                                                    'Protocols'])[0])
+                except Exception as e:
+                    errors.append(e)
+
+    thread = threading.Thread(target=searcher)
+    thread.start()
+    try:
+        with app.app_context():
+            for _ in range(50):
+                search_index.rebuild(db.session, 'default')
+    finally:
+        done.set()
+        thread.join()
+
+    assert errors == []
+    assert totals == {expected}
+
+class LateCommitSession:
+    '''Runs a rebuild's first query, then commits a new question through
+    db.session before returning its rows, as if another request's commit
+    landed while the rebuild was underway.
+    '''
+
+    def __init__(self, question):
+        self.question = question
+        self.query_obj = None
+
+    def query(self, *args):
+        self.query_obj = db.session.query(*args)
+        return self
+
+    def options(self, *args):
+        self.query_obj = self.query_obj.options(*args)
+        return self
+
+    def filter(self, *args):
+        self.query_obj = self.query_obj.filter(*args)
+        return self
+
+    def all(self):
+        rows = self.query_obj.all()
+        if self.question is not None:
+            db.session.add(self.question)
+            db.session.commit()
+            self.question = None
+        return rows
+
+def test_commit_during_rebuild_kept(app, db_questions):
+
+    q = MultipleChoice(text='Which layer does ARP work at?',
+                        qtype='multiple_choice',
+                        correct='2',
+                        incorrect='3,4')
+
+    with app.app_context():
+        index = search_index.rebuild(LateCommitSession(q), 'default')
+
+        #the rebuild's queries ran before the commit; it was replayed
+        assert index.search('arp')[0] == 1
+        assert search_index.get_index('default') is index
+
+        db.session.delete(q)
+        db.session.commit()
+        assert index.search('arp')[0] == 0
@@ -0,0 +1,66 @@
+from collections import Counter
+from app.shuffle import shuffle
+from app.models import MultipleChoice
+from app.qtypes import prep_multichoice
+
+def test_shuffle_is_permutation():
+
+    for qid in range(50):
+        items = list(range(7))
+        shuffle(items, 1234, qid)
+        assert sorted(items) == list(range(7))
+
+def test_shuffle_reproducible():
+
+    a, b, c = list('abcdef'), list('abcdef'), list('abcdef')
+    shuffle(a, 99, 5)
+    shuffle(b, 99, 5)
+    shuffle(c, 100, 5)
+
+    assert a == b
+    assert a != c
+
+def test_shuffle_tracking():
+
+    for qid in range(50):
+        items = list('abcde')
+        for track in range(len(items)):
+            shuffled = list(items)
+            pos = shuffle(shuffled, 7, qid, track=track)
+            assert shuffled[pos] == items[track]
+
+def test_shuffle_distribution():
+
+    counts = Counter()
+    for qid in range(48000):
+        items = list(range(4))
+        shuffle(items, 42, qid)
+        counts[tuple(items)] += 1
+
+    #all 24 orderings, each close to 2000 times
+    assert len(counts) == 24
+    assert all(1700 < c < 2300 for c in counts.values())
+
+def test_shuffle_long_list():
+
+    #longer than one 64 bit draw can cover without bias
+    items = list(range(40))
+    shuffle(items, 3, 9)
+
+    assert sorted(items) == list(range(40))
+    assert items != list(range(40))
+
+def test_prep_multichoice_seeded():
+
+    qlist = [MultipleChoice(id=n, text='t', qtype='multiple_choice',
+                            correct='right', incorrect='w1,w2,w3,w4')
+                for n in range(1, 30)]
+
+    first = prep_multichoice(qlist, seed=2022)
+    assert first == prep_multichoice(qlist, seed=2022)
+
+    for key in first:
+        assert key['choices'][key['correct_index']] == 'right'
+
+    #different questions in the same round don't share one ordering
+    assert len({k['correct_index'] for k in first}) > 1
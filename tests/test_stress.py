@@ -0,0 +1,262 @@
+import os
+import time
+import pytest
+from sqlalchemy import select, func
+from hypothesis import given, settings, strategies as st, HealthCheck
+from werkzeug.datastructures import ImmutableMultiDict
+from app import create_app
+from app.models import Base, MultipleChoice
+from app.extensions import db
+from app.home import generate_id_list
+from app.qtypes import prep_multichoice
+from app.quiz import extract_answers, score_input, load_round
+from tests.bank import bank_session
+
+#bank size and time budgets can be tuned for slower machines or bigger runs.
+#wall clock budgets are only enforced w/ STRESS_TIMING=1, since shared ci
+#machines are too noisy for them; results are checked either way
+N_QUESTIONS = int(os.environ.get('STRESS_QUESTIONS', 100000))
+BUDGET_SCALE = float(os.environ.get('STRESS_BUDGET_SCALE', 1))
+CHECK_TIMING = os.environ.get('STRESS_TIMING') == '1'
+
+#examples share one module scoped bank; nothing they do is committed
+PROPERTY_SETTINGS = settings(max_examples=25, deadline=None,
+                        suppress_health_check=[HealthCheck.too_slow])
+
+def within_budget(seconds, fn, *args, **kwargs):
+    '''Runs fn, failing if it takes longer than seconds * BUDGET_SCALE when
+    CHECK_TIMING is on.
+    '''
+
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    if not CHECK_TIMING:
+        return result
+
+    limit = seconds * BUDGET_SCALE
+    assert elapsed <= limit, '{} took {:.2f}s, budget {:.2f}s'.format(
+                                fn.__name__, elapsed, limit)
+    return result
+
+@pytest.fixture(scope='module')
+def app():
+    '''App instance with database for functional tests'''
+
+    application = create_app(config_type='Test')
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='module')
+def bank(app):
+    '''N_QUESTIONS multiple choice questions over 25 skewed topics'''
+
+    with bank_session(app, N_QUESTIONS, topic_skew=1.2) as generated:
+        yield generated
+
+@pytest.fixture(scope='module')
+def questions(bank):
+    '''Every generated question loaded as an ORM object, in id order'''
+
+    return db.session.query(MultipleChoice)\
+                .order_by(MultipleChoice.id)\
+                .all()
+
+def test_bank_shape(bank):
+
+    assert len(bank.question_ids) == N_QUESTIONS
+    assert db.session.query(MultipleChoice).count() == N_QUESTIONS
+
+    #skewed topics: the most popular dwarfs the least
+    sizes = [len(bank.topic_questions[t]) for t in bank.topic_names]
+    assert sizes[0] > 5 * sizes[-1]
+
+@given(data=st.data())
+@PROPERTY_SETTINGS
+def test_generate_id_list_property(bank, data):
+
+    topics = data.draw(st.lists(st.sampled_from(bank.topic_names),
+                                min_size=1, max_size=5, unique=True))
+    randomize = data.draw(st.booleans())
+
+    ids = within_budget(3, generate_id_list, topics, randomize=randomize)
+
+    assert len(ids) == len(set(ids))
+    assert set(ids) == bank.ids_for(topics)
+
+def test_generate_id_list_whole_bank(bank):
+
+    ids = within_budget(5, generate_id_list, bank.topic_names, randomize=True)
+
+    assert sorted(ids) == bank.question_ids
+
+def blocks(questions):
+    '''Strategy for a contiguous run of up to 500 loaded questions.'''
+
+    return st.tuples(st.integers(min_value=0, max_value=len(questions) - 1),
+                     st.integers(min_value=1, max_value=500))\
+                .map(lambda b : questions[b[0]:b[0] + b[1]])
+
+def check_prepped(bank, qlist, answer_key):
+    assert len(answer_key) == len(qlist)
+
+    for q, key in zip(qlist, answer_key):
+        correct, incorrect = bank.choices[q.id]
+
+        assert key['id'] == q.id
+        assert key['choices'][key['correct_index']] == correct
+        assert sorted(key['choices']) == sorted(incorrect + [correct])
+
+@given(seed=st.integers(min_value=0, max_value=2**64 - 1), data=st.data())
+@PROPERTY_SETTINGS
+def test_prep_multichoice_property(bank, questions, seed, data):
+
+    qlist = data.draw(blocks(questions))
+    answer_key = prep_multichoice(qlist, seed)
+
+    check_prepped(bank, qlist, answer_key)
+    assert prep_multichoice(qlist, seed) == answer_key
+
+def test_prep_multichoice_whole_bank(bank, questions):
+
+    answer_key = within_budget(5, prep_multichoice, questions, 2022)
+
+    check_prepped(bank, questions, answer_key)
+
+@given(seed=st.integers(min_value=0, max_value=2**64 - 1),
+       block=st.lists(st.integers(min_value=1, max_value=N_QUESTIONS),
+                      min_size=1, max_size=50, unique=True))
+@PROPERTY_SETTINGS
+def test_round_reproducible(bank, seed, block):
+
+    first = load_round(block, seed)
+
+    assert [k['id'] for k in first] == block
+    assert load_round(block, seed) == first
+
+answer_values = st.one_of(st.integers(min_value=0, max_value=9).map(str),
+                          st.text(max_size=3))
+
+@given(answers=st.dictionaries(st.integers(min_value=0, max_value=10**6),
+                               answer_values, max_size=200),
+       junk=st.dictionaries(st.text(max_size=6).filter(
+                                lambda k : not (k[:1] == 'q' and
+                                                k[1:].isdigit())),
+                            st.text(max_size=3), max_size=20))
+@PROPERTY_SETTINGS
+def test_extract_answers_property(answers, junk):
+
+    fields = [('q{}'.format(i), v) for i, v in answers.items()]
+    form = ImmutableMultiDict(fields + list(junk.items()))
+
+    assert extract_answers(form) == answers
+
+def test_extract_answers_at_scale():
+
+    form = ImmutableMultiDict([('q{}'.format(i), str(i % 5))
+                                for i in range(N_QUESTIONS)] +
+                              [('csrf_token', 'x')])
+
+    answers = within_budget(3, extract_answers, form)
+
+    assert len(answers) == N_QUESTIONS
+
+def answer_all(answer_key, wrong):
+    '''Answers every question, deliberately wrong for indices in wrong.'''
+
+    user_answers = {}
+    for i, key in enumerate(answer_key):
+        idx = key['correct_index']
+        if i in wrong:
+            idx = (idx + 1) % len(key['choices'])
+        user_answers[i] = str(idx)
+    return user_answers
+
+def parses_to(value, n):
+    try:
+        return int(value) == n
+    except ValueError:
+        return False
+
+#anything a client could post, weighted towards digit-like characters
+#(superscripts, other scripts' digits) that naive parsing trips over
+tampered_values = st.one_of(st.text(max_size=3),
+                            st.text(st.characters(categories=['Nd', 'No']),
+                                    min_size=1, max_size=3))
+
+@given(seed=st.integers(min_value=0, max_value=2**64 - 1), data=st.data())
+@PROPERTY_SETTINGS
+def test_score_input_property(bank, questions, seed, data):
+
+    answer_key = prep_multichoice(data.draw(blocks(questions)), seed)
+    wrong = data.draw(st.sets(st.integers(min_value=0,
+                                          max_value=len(answer_key) - 1)))
+
+    #unanswered and tampered values must never score as correct; both are
+    #taken from one shuffle of the indices so either may use up all of them
+    user_answers = answer_all(answer_key, wrong)
+    order = data.draw(st.permutations(sorted(user_answers)))
+    n_skipped = data.draw(st.integers(min_value=0, max_value=len(order)))
+    n_tampered = data.draw(st.integers(
+                            min_value=0,
+                            max_value=min(5, len(order) - n_skipped)))
+
+    skipped = set(order[:n_skipped])
+    tampered = set(order[n_skipped:n_skipped + n_tampered])
+
+    for i in skipped:
+        del user_answers[i]
+    for i in tampered:
+        correct = answer_key[i]['correct_index']
+        user_answers[i] = data.draw(tampered_values.filter(
+                                        lambda v : not parses_to(v, correct)))
+
+    score = score_input(user_answers, answer_key)
+
+    assert set(score) == set(user_answers)
+    assert {i for i, s in score.items() if s == 'correct'} == \
+            set(user_answers) - wrong - tampered
+
+def test_score_input_whole_bank(bank, questions):
+
+    answer_key = prep_multichoice(questions, 2022)
+    wrong = set(range(0, len(answer_key), 7))
+
+    score = within_budget(3, score_input, answer_all(answer_key, wrong),
+                            answer_key)
+
+    assert len(score) == len(answer_key)
+    assert {i for i, s in score.items() if s == 'incorrect'} == wrong
+
+def count_rows(table):
+    #straight from the db, not through whichever session is current
+    with db.engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table))\
+                    .scalar()
+
+def test_bank_session_rolled_back(bank):
+
+    #own app and database, nested inside the module bank's session
+    application = create_app(config_type='Test')
+    with application.app_context():
+        Base.metadata.create_all(db.engine)
+
+    #repeatable w/ the same ids, unlike committed function scoped fixtures
+    for _ in range(2):
+        with bank_session(application, 100) as small:
+            assert db.session.query(MultipleChoice).count() == 100
+
+        with application.app_context():
+            assert count_rows(MultipleChoice.__table__) == 0
+
+    #the module bank's session is back in place
+    assert db.session.query(MultipleChoice).count() == N_QUESTIONS
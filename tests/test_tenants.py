@@ -0,0 +1,210 @@
+import pytest
+from flask import template_rendered, session
+from app import create_app
+from app.models import Base, Topic, Question, MultipleChoice
+from app.extensions import db, cache
+
+ACME = {'X-Tenant' : 'acme'}
+GLOBEX = {'X-Tenant' : 'globex'}
+
+@pytest.fixture(scope='module')
+def app():
+    '''App instance with database for functional tests'''
+
+    application = create_app(config_type='Test')
+    application.config['TENANT_HEADER'] = 'X-Tenant'
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+    
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='function')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='function')
+def captured_templates(app):
+    '''Taken verbatim from Flask's documentation on signals:
+    flask.palletsprojects.com/en/2.1.x/signals/#subscribing-to-signals
+    '''
+    recorded = []
+    def record(sender, template, context, **extra):
+        recorded.append((template, context))
+    template_rendered.connect(record, app)
+    try:
+        yield recorded
+    finally:
+        template_rendered.disconnect(record, app)
+
+@pytest.fixture(scope='module')
+def db_questions(app):
+    '''Tenants 'acme' and 'globex' each have a 'Routing' topic with one
+    question (ids 1 and 2 respectively); only globex has 'Wireless'.
+    '''
+
+    with app.app_context():
+        for tenant, extra in (('acme', []), ('globex', ['Wireless'])):
+            q = MultipleChoice(tenant=tenant,
+                               text='{} routing question'.format(tenant),
+                               correct='correct',
+                               incorrect='choice1,choice2')
+            q.topics.append(Topic(tenant=tenant, name='Routing'))
+            db.session.add(q)
+            db.session.add_all(Topic(tenant=tenant, name=n) for n in extra)
+            db.session.commit()
+
+    yield
+
+    with app.app_context():
+        db.session.query(Topic).delete()
+        db.session.query(Question).delete()
+        db.session.commit()
+
+def test_tenant_resolution(app, client, db_questions):
+
+    assert client.get('/', headers={'X-Tenant' : '../etc'}).status_code == 400
+
+    app.config['TENANTS'] = ['acme']
+    try:
+        assert client.get('/', headers=ACME).status_code == 200
+        assert client.get('/', headers=GLOBEX).status_code == 404
+    finally:
+        app.config['TENANTS'] = []
+
+def test_tenant_header_off_by_default(app, client, captured_templates,
+                                        db_questions):
+
+    app.config['TENANT_HEADER'] = None
+    try:
+        #a client can't pick a tenant unless a header is configured
+        client.get('/', headers=GLOBEX)
+        _, context = captured_templates[-1]
+        assert context['quiz_topics'] == []
+    finally:
+        app.config['TENANT_HEADER'] = 'X-Tenant'
+
+    assert create_app(config_type='Test').config['TENANT_HEADER'] is None
+
+def test_topics_per_tenant(client, captured_templates, db_questions):
+
+    client.get('/', headers=ACME)
+    client.get('/', headers=GLOBEX)
+    client.get('/')
+
+    topics = [context['quiz_topics'] for _, context in captured_templates]
+
+    assert topics[0] == ['Routing']
+    assert sorted(topics[1]) == ['Routing', 'Wireless']
+    assert topics[2] == []
+
+def test_quiz_isolation(client, captured_templates, db_questions):
+
+    with client:
+        client.post('/quiz', data={'Routing' : ''}, headers=ACME)
+        assert session['question_ids'] == [1]
+        assert session['tenant'] == 'acme'
+
+    #acme's run can't be continued as globex
+    assert client.get('/get', headers=GLOBEX).status_code == 400
+
+    client.get('/get', headers=ACME)
+    _, context = captured_templates[-1]
+    assert [q['id'] for q in context['questions']] == [1]
+
+    with client:
+        client.post('/quiz', data={'query' : 'Routing OR Wireless'},
+                    headers=GLOBEX)
+    
+    client.get('/get', headers=GLOBEX)
+    _, context = captured_templates[-1]
+    assert [q['id'] for q in context['questions']] == [2]
+
+    #a tampered id list still can't load another tenant's questions
+    with client.session_transaction() as sess:
+        sess['question_ids'] = [1, 2]
+        del sess['query']
+
+    client.get('/get', headers=GLOBEX)
+    _, context = captured_templates[-1]
+    assert [q['id'] for q in context['questions']] == [2]
+
+def test_search_per_tenant(client, db_questions):
+
+    response = client.get('/search', query_string={'q' : 'routing'},
+                            headers=ACME)
+    assert [r['id'] for r in response.get_json()['results']] == [1]
+
+    response = client.get('/search', query_string={'q' : 'globex'},
+                            headers=ACME)
+    assert response.get_json()['total'] == 0
+
+def test_cache_invalidated_on_commit(app, client, captured_templates,
+                                        db_questions):
+
+    client.get('/', headers=ACME)
+
+    with app.app_context():
+        assert cache.get('acme', 'topics') == ['Routing']
+        db.session.add(Topic(tenant='acme', name='Security'))
+        db.session.commit()
+
+        #only the tenant that changed is dropped
+        assert cache.get('acme', 'topics') is None
+
+    client.get('/', headers=ACME)
+    _, context = captured_templates[-1]
+    assert sorted(context['quiz_topics']) == ['Routing', 'Security']
+
+def test_cache_quota_isolation(app):
+
+    app.config['TENANT_CACHE_QUOTAS'] = {'small' : 400}
+    try:
+        with app.app_context():
+            cache.set('big', 'keep', ['x'] * 10)
+
+            for n in range(20):
+                cache.set('small', n, ['y'] * 10)
+
+            #small tenant only evicts its own oldest entries
+            assert cache.usage('small') <= 400
+            assert cache.get('small', 0) is None
+            assert cache.get('small', 19) is not None
+            assert cache.get('big', 'keep') == ['x'] * 10
+
+            #values larger than the whole quota are never stored
+            cache.set('small', 'huge', ['z'] * 1000)
+            assert cache.get('small', 'huge') is None
+            assert cache.get('small', 19) is not None
+    finally:
+        app.config['TENANT_CACHE_QUOTAS'] = {}
+        with app.app_context():
+            cache.invalidate()
+
+def test_cache_ttl(app, client, captured_templates, db_questions):
+
+    client.get('/', headers=ACME)
+
+    #a topic added by another process: no commit event reaches this cache
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(Topic.__table__.insert()
+                        .values(tenant='acme', name='Voice'))
+
+    client.get('/', headers=ACME)
+    _, context = captured_templates[-1]
+    assert 'Voice' not in context['quiz_topics']
+
+    with app.app_context():
+        partition = app.extensions['tenant_cache'][0]['acme']
+        for key, (value, size, stored) in list(partition.entries.items()):
+            partition.entries[key] = (value, size,
+                                        stored - partition.ttl - 1)
+
+    client.get('/', headers=ACME)
+    _, context = captured_templates[-1]
+    assert 'Voice' in context['quiz_topics']
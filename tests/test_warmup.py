@@ -0,0 +1,124 @@
+import pytest
+from app import create_app
+from app.models import Base, Topic, Question, MultipleChoice
+from app.extensions import db, search_index, cache
+from app import warmup
+from app.warmup import start_warmup, TEMPLATES
+
+@pytest.fixture(scope='module')
+def app():
+    '''App instance with database for functional tests'''
+
+    application = create_app(config_type='Test')
+
+    with application.app_context():
+        Base.metadata.drop_all(db.engine)
+        Base.metadata.create_all(db.engine)
+
+    yield application
+    
+    with application.app_context():
+        db.session.remove()
+        Base.metadata.drop_all(db.engine)
+
+@pytest.fixture(scope='function')
+def client(app):
+    return app.test_client()
+
+@pytest.fixture(scope='module')
+def db_questions(app):
+    '''One question tagged 'Topic1'.'''
+
+    q = MultipleChoice(text='test text', correct='a', incorrect='b,c')
+    q.topics.append(Topic(name='Topic1'))
+
+    with app.app_context():
+        db.session.add(q)
+        db.session.commit()
+
+    yield
+
+    with app.app_context():
+        db.session.query(Topic).delete()
+        db.session.query(Question).delete()
+        db.session.commit()
+
+def test_ready_without_warmup(client):
+
+    response = client.get('/ready')
+
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
+
+def test_background_warmup(app, client, db_questions):
+
+    app.config['WARMUP'] = 'background'
+    try:
+        start_warmup(app)
+        app.extensions['warmup']['thread'].join(timeout=10)
+    finally:
+        app.config['WARMUP'] = 'off'
+
+    assert client.get('/ready').status_code == 200
+
+    cached = {key[1] for key in app.jinja_env.cache.keys()}
+    assert set(TEMPLATES) <= cached
+
+    with app.app_context():
+        assert cache.get('default', 'topics') == ['Topic1']
+        assert search_index.get_index('default').built
+
+def test_ready_exempt_from_tenant_checks(app, client):
+
+    app.config['TENANTS'] = ['acme']
+    try:
+        assert client.get('/ready').status_code == 200
+    finally:
+        app.config['TENANTS'] = []
+
+def test_failed_warmup():
+
+    #no tables exist, so priming the topic cache fails every attempt
+    application = create_app(config_type='Test')
+    application.config.update(WARMUP='sync', WARMUP_RETRIES=2,
+                              WARMUP_BACKOFF=0.01)
+    start_warmup(application)
+
+    response = application.test_client().get('/ready')
+
+    assert response.status_code == 503
+    assert response.get_json() == {'status' : 'failed'}
+
+def test_warmup_retried(app, client, db_questions, monkeypatch):
+
+    #e.g. the database is still starting when the worker boots
+    attempts = []
+    def flaky(application):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError('db not up yet')
+
+    monkeypatch.setattr(warmup, 'open_connections', flaky)
+    app.config.update(WARMUP='sync', WARMUP_RETRIES=3, WARMUP_BACKOFF=0.01)
+    try:
+        start_warmup(app)
+    finally:
+        app.config['WARMUP'] = 'off'
+
+    assert len(attempts) == 3
+    assert client.get('/ready').get_json() == {'status' : 'ready'}
+
+def test_no_warmup_in_cli_commands(app):
+
+    @app.cli.command('probe')
+    def probe():
+        app.config['WARMUP'] = 'background'
+        try:
+            start_warmup(app)
+        finally:
+            app.config['WARMUP'] = 'off'
+
+    assert app.test_cli_runner().invoke(args=['probe']).exit_code == 0
+    
+    #not started, and nothing left for the command to wait on
+    assert 'thread' not in app.extensions['warmup']